@@ -0,0 +1,327 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+from uuid import uuid4
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+APPS = {
+    "book_api": "projects.api.book_api.app:app",
+    "book_api_refactoring": "projects.api.book_api_refactoring.src:app",
+    "files": "projects.api.files.app:app",
+}
+NAMES = ["Война и Мир", "Преступление и наказание", "Мастер и Маргарита", "1984"]
+AUTHORS = ["Л. Н. Толстой", "Ф. М. Достоевский", "М. А. Булгаков", "Дж. Оруэлл"]
+# book_api_refactoring's largest page.
+MAX_PAGE_SIZE = 1000
+
+
+@dataclass
+class Scenario:
+    endpoint: str
+    request: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+class RssSampler:
+    """Polls the resident set size of a process from a background thread."""
+
+    def __init__(self, pid: int, interval: float = 0.01):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self.peak = read_rss(self.pid)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, read_rss(self.pid))
+
+
+def read_rss(pid: int) -> int:
+    try:
+        import psutil
+
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    # Linux without psutil.
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def make_book(index: int) -> dict:
+    return {
+        "name": f"{random.choice(NAMES)} {index}",
+        "author": random.choice(AUTHORS),
+        "year": random.randint(1800, 2025),
+        "annotation": "Классический роман-эпопея " * 4,
+    }
+
+
+def prepare_workdir(
+    app_name: str, workdir: str, args: argparse.Namespace
+) -> tuple[str, list[str]]:
+    """Create the data the app expects relative to its working directory."""
+    if app_name == "files":
+        uploads = os.path.join(workdir, "uploads")
+        os.makedirs(uploads)
+        names = [f"document_{index}.pdf" for index in range(args.files)]
+        for name in names:
+            with open(os.path.join(uploads, name), "wb") as f:
+                f.write(os.urandom(args.file_size))
+        return workdir, names
+    books = [{**make_book(i), "id": str(uuid4())} for i in range(args.catalog_size)]
+    if app_name == "book_api_refactoring":
+        # DATA_FILE is "../books.json" relative to the working directory.
+        data_file = os.path.join(workdir, "books.json")
+        workdir = os.path.join(workdir, "run")
+        os.makedirs(workdir)
+    else:
+        data_file = os.path.join(workdir, "books.json")
+    with open(data_file, "w", encoding="utf-8") as f:
+        json.dump(books, f)
+    return workdir, [book["id"] for book in books]
+
+
+def start_server(app_name: str, workdir: str, port: int) -> subprocess.Popen:
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    command = [sys.executable, "-m", "uvicorn", APPS[app_name]]
+    command += ["--port", str(port), "--log-level", "warning"]
+    server = subprocess.Popen(command, cwd=workdir, env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"{app_name} exited with code {server.returncode}")
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return server
+        time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"{app_name} did not start in time")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def get_all_books(
+    client: httpx.AsyncClient, params: dict[str, str]
+) -> httpx.Response:
+    """Get every matching book, following X-Next-Cursor through the pages.
+
+    book_api returns the whole listing at once, book_api_refactoring pages it,
+    so both apps are timed on the same amount of work.
+    """
+    params = {**params, "limit": str(MAX_PAGE_SIZE)}
+    while True:
+        response = await client.get("/books", params=params)
+        cursor = response.headers.get("x-next-cursor")
+        if response.status_code >= 400 or cursor is None:
+            return response
+        params["cursor"] = cursor
+
+
+def book_scenarios(app_name: str, ids: list[str]) -> list[Scenario]:
+    scenarios = [
+        Scenario("GET /books", lambda client, i: get_all_books(client, {})),
+        Scenario(
+            "GET /books?name=",
+            lambda client, i: get_all_books(client, {"name": "мир 1"}),
+        ),
+        Scenario(
+            "POST /books", lambda client, i: client.post("/books", json=make_book(i))
+        ),
+        Scenario(
+            "PUT /books/{id}",
+            lambda client, i: client.put(
+                f"/books/{ids[i % len(ids)]}", json=make_book(i)
+            ),
+        ),
+    ]
+    if app_name == "book_api_refactoring":
+        scenarios.append(
+            Scenario(
+                "GET /books?format=ndjson",
+                lambda client, i: client.get("/books", params={"format": "ndjson"}),
+            )
+        )
+    return scenarios
+
+
+def file_scenarios(names: list[str], file_size: int) -> list[Scenario]:
+    payload = os.urandom(file_size)
+
+    def upload(client: httpx.AsyncClient, i: int):
+        files = {"file": (f"upload_{i}_{uuid4().hex}.pdf", payload, "application/pdf")}
+        return client.post("/files", files=files)
+
+    return [
+        Scenario("POST /files", upload),
+        Scenario(
+            "GET /files/{filename}",
+            lambda client, i: client.get(f"/files/{names[i % len(names)]}"),
+        ),
+    ]
+
+
+async def run_scenario(
+    base_url: str, scenario: Scenario, requests: int, concurrency: int
+) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await scenario.request(client, i)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    cut_points = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "endpoint": scenario.endpoint,
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 3),
+            "p50": round(cut_points[49] * 1000, 3),
+            "p95": round(cut_points[94] * 1000, 3),
+            "p99": round(cut_points[98] * 1000, 3),
+            "max": round(max(latencies) * 1000, 3),
+        },
+    }
+
+
+def benchmark_app(app_name: str, args: argparse.Namespace) -> list[dict]:
+    with tempfile.TemporaryDirectory(prefix=f"bench_{app_name}_") as scratch:
+        return run_benchmarks(app_name, scratch, args)
+
+
+def run_benchmarks(app_name: str, scratch: str, args: argparse.Namespace) -> list[dict]:
+    workdir, keys = prepare_workdir(app_name, scratch, args)
+    port = free_port()
+    server = start_server(app_name, workdir, port)
+    if app_name == "files":
+        scenarios = file_scenarios(keys, args.file_size)
+    else:
+        scenarios = book_scenarios(app_name, keys)
+    results = []
+    try:
+        for scenario in scenarios:
+            if args.endpoint and args.endpoint not in scenario.endpoint:
+                continue
+            with RssSampler(server.pid) as sampler:
+                result = asyncio.run(
+                    run_scenario(
+                        f"http://127.0.0.1:{port}",
+                        scenario,
+                        args.requests,
+                        args.concurrency,
+                    )
+                )
+            result = {
+                "app": app_name,
+                **result,
+                "peak_rss_mb": round(sampler.peak / 2**20, 1),
+            }
+            print(
+                f"{app_name:22} {result['endpoint']:26} "
+                f"{result['throughput_rps']:9.1f} req/s  "
+                f"p50 {result['latency_ms']['p50']:8.2f} ms  "
+                f"p99 {result['latency_ms']['p99']:8.2f} ms  "
+                f"rss {result['peak_rss_mb']:7.1f} MB  errors {result['errors']}"
+            )
+            results.append(result)
+    finally:
+        server.terminate()
+        server.wait()
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the FastAPI apps")
+    parser.add_argument("--apps", nargs="+", choices=list(APPS), default=list(APPS))
+    parser.add_argument("--endpoint", help="only run endpoints containing this text")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--catalog-size", type=int, default=10_000)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--file-size", type=int, default=256 * 1024)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+    if args.requests < 2:
+        parser.error("--requests must be at least 2 to compute percentiles")
+    random.seed(args.seed)
+
+    results = []
+    for app_name in args.apps:
+        results += benchmark_app(app_name, args)
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            key: value for key, value in vars(args).items() if key != "output"
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
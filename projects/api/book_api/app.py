@@ -1,13 +1,18 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Query, Body, HTTPException, Path
 from pydantic import BaseModel, Field
 from typing import List, Optional
 import json
+import logging
 import os
+import threading
 from uuid import uuid4, UUID
 
-app = FastAPI()
-
 DATA_FILE = "books.json"
+FLUSH_INTERVAL = 0.5  # seconds
+FLUSH_RETRY_INTERVAL = 5  # seconds
+
+logger = logging.getLogger(__name__)
 
 
 class Book(BaseModel):
@@ -63,8 +68,108 @@ def load_books() -> list[Book]:
 
 def save_books(books: list[Book]):
     data = [{**book.model_dump(exclude={"id"}), "id": str(book.id)} for book in books]
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
+    tmp_file = f"{DATA_FILE}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=4)
+    os.replace(tmp_file, DATA_FILE)
+
+
+class BookRepository:
+    """In-memory catalog keyed by id, persisted by a write-behind flusher thread."""
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL):
+        self._flush_interval = flush_interval
+        self._books: dict[UUID, Book] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def open(self):
+        self._books = {book.id: book for book in load_books()}
+        self._closed.clear()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def close(self):
+        self._closed.set()
+        self._wakeup.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+
+    def list_books(self) -> list[Book]:
+        with self._lock:
+            return list(self._books.values())
+
+    def add(self, book: Book):
+        with self._lock:
+            self._books[book.id] = book
+            self._mark_dirty()
+
+    def update(self, book: Book) -> bool:
+        with self._lock:
+            if book.id not in self._books:
+                return False
+            self._books[book.id] = book
+            self._mark_dirty()
+        return True
+
+    def delete(self, book_id: UUID) -> bool:
+        with self._lock:
+            if self._books.pop(book_id, None) is None:
+                return False
+            self._mark_dirty()
+        return True
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            books = list(self._books.values())
+        try:
+            save_books(books)
+        except BaseException:
+            with self._lock:
+                self._dirty = True
+            raise
+
+    def _mark_dirty(self):
+        self._dirty = True
+        self._wakeup.set()
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait()
+            # Let writes arriving during the interval coalesce into one rewrite.
+            if self._closed.wait(self._flush_interval):
+                return
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Disk full, permissions...: keep the changes and try again
+                # later instead of losing the flusher until shutdown.
+                logger.exception("Saving books failed")
+                if self._closed.wait(FLUSH_RETRY_INTERVAL):
+                    return
+                self._wakeup.set()
+
+
+repository = BookRepository()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    repository.open()
+    yield
+    repository.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get(
@@ -75,7 +180,7 @@ def save_books(books: list[Book]):
     status_code=200,
 )
 def get_books(name: Optional[str] = Query(default=None)):
-    books = load_books()
+    books = repository.list_books()
     if name:
         books = [book for book in books if name.lower() in book.name.lower()]
     return books
@@ -89,11 +194,9 @@ def get_books(name: Optional[str] = Query(default=None)):
     status_code=201,
 )
 def create_book(book: CreateBook = Body()):
-    books = load_books()
     new_book_id = uuid4()
     book = Book(**book.model_dump(), id=new_book_id)
-    books.append(book)
-    save_books(books)
+    repository.add(book)
     return book
 
 
@@ -105,13 +208,10 @@ def create_book(book: CreateBook = Body()):
     status_code=200,
 )
 def update_book(book_id: UUID = Path(), updated_book: UpdateBook = Body()):
-    books = load_books()
-    for index, book in enumerate(books):
-        if book.id == book_id:
-            books[index] = Book(**updated_book.model_dump(), id=book_id)
-            save_books(books)
-            return books[index]
-    raise HTTPException(status_code=404, detail="Book not found")
+    book = Book(**updated_book.model_dump(), id=book_id)
+    if not repository.update(book):
+        raise HTTPException(status_code=404, detail="Book not found")
+    return book
 
 
 @app.delete(
@@ -122,10 +222,6 @@ def update_book(book_id: UUID = Path(), updated_book: UpdateBook = Body()):
     status_code=200,
 )
 def delete_book(book_id: UUID = Path()):
-    books = load_books()
-    for index, book in enumerate(books):
-        if book.id == book_id:
-            del books[index]
-            save_books(books)
-            return SuccessMessage(message="Book was successfully deleted")
-    raise HTTPException(status_code=404, detail="Book not found")
+    if not repository.delete(book_id):
+        raise HTTPException(status_code=404, detail="Book not found")
+    return SuccessMessage(message="Book was successfully deleted")
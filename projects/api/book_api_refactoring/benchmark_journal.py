@@ -0,0 +1,58 @@
+import asyncio
+import os
+import tempfile
+import time
+from uuid import uuid4
+from src.journal import BookJournal
+from src.schemas import Book
+from src.utils import save_books
+
+CATALOG_SIZE = 100_000
+WRITES = 200
+
+
+def make_book(index: int) -> Book:
+    return Book(
+        id=uuid4(),
+        name=f"Книга {index}",
+        author=f"Автор {index % 1000}",
+        year=1800 + index % 220,
+        annotation="Классический роман-эпопея " * 4,
+    )
+
+
+async def bench_full_rewrite(books: list[Book], data_file: str) -> float:
+    start = time.perf_counter()
+    for index in range(WRITES):
+        books[index] = books[index].model_copy(update={"year": 2000})
+        await save_books(books, data_file)
+    return time.perf_counter() - start
+
+
+async def bench_journal(books: list[Book], data_file: str, journal_file: str) -> float:
+    await save_books(books, data_file)
+    journal = BookJournal(data_file, journal_file, compact_threshold=WRITES + 1)
+    await journal.open()
+    start = time.perf_counter()
+    for index in range(WRITES):
+        book = books[index].model_copy(update={"year": 2001})
+        await journal.append([{book.id: book}])
+    elapsed = time.perf_counter() - start
+    await journal.close()
+    return elapsed
+
+
+async def main():
+    books = [make_book(index) for index in range(CATALOG_SIZE)]
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, "books.json")
+        journal_file = os.path.join(directory, "books.journal")
+        rewrite = await bench_full_rewrite(books, data_file)
+        journal = await bench_journal(books, data_file, journal_file)
+    print(f"Catalog: {CATALOG_SIZE} books, {WRITES} single-book writes")
+    print(f"Full rewrite: {WRITES / rewrite:10.1f} writes/s")
+    print(f"Journal:      {WRITES / journal:10.1f} writes/s")
+    print(f"Speedup:      {rewrite / journal:10.1f}x")
+
+
+asyncio.run(main())
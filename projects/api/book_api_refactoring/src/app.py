@@ -1,25 +1,148 @@
-from fastapi import FastAPI, Query, Body, HTTPException, Path
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query, Body, Header, HTTPException, Path, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from typing import List, Literal, Optional
 from uuid import uuid4, UUID
-from .schemas import Book, UpdateBook, CreateBook, SuccessMessage
-from .utils import load_books, save_books
+from .schemas import (
+    Book,
+    UpdateBook,
+    CreateBook,
+    SuccessMessage,
+    BatchRequest,
+    BatchItemResult,
+    BatchResult,
+)
+from .cache import ResponseCache, etag_matches
+from .journal import BookJournal
+from .repository import BookRepository
+from .sqlite_storage import SQLiteBookRepository
+from .storage import BookStorage, BookNotFoundError, VersionConflictError
+from .utils import STORAGE_MODE
+
+if STORAGE_MODE == "sqlite":
+    repository: BookStorage = SQLiteBookRepository()
+else:
+    repository = BookRepository(
+        journal=BookJournal() if STORAGE_MODE == "journal" else None
+    )
+response_cache = ResponseCache()
+books_adapter = TypeAdapter(List[Book])
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await repository.open()
+    yield
+    await repository.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
 
 
-app = FastAPI()
+def parse_cursor(cursor: Optional[str]) -> Optional[int]:
+    if cursor is None:
+        return None
+    try:
+        return int(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def record_etag(book: Book) -> str:
+    return f'"{book.version}"'
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=412, detail="If-Match does not match")
+
+
+async def stream_books(
+    name: Optional[str],
+    author: Optional[str],
+    year: Optional[int],
+    cursor: Optional[int],
+    limit: Optional[int],
+):
+    async for books in repository.iter_books(name, author, year, cursor):
+        if limit is not None:
+            books = books[:limit]
+            limit -= len(books)
+        yield "".join(book.model_dump_json() + "\n" for book in books).encode("utf-8")
+        if limit == 0:
+            return
 
 
 @app.get(
     "/books",
-    description="Get books with filters",
+    description=(
+        "Get books with filters. Results are paginated in catalog order: pass the "
+        "X-Next-Cursor response header back as `cursor` to get the next page. "
+        "With `format=ndjson` the listing is streamed as newline-delimited JSON "
+        "and `limit` only caps the number of streamed books. JSON pages carry an "
+        "ETag and answer a matching If-None-Match with 304 Not Modified."
+    ),
     response_description="List of books",
     response_model=List[Book],
     status_code=200,
 )
-async def get_books(name: Optional[str] = Query(default=None)):
-    books = await load_books()
-    if name:
-        books = [book for book in books if name.lower() in book.name.lower()]
-    return books
+async def get_books(
+    name: Optional[str] = Query(default=None),
+    author: Optional[str] = Query(default=None),
+    year: Optional[int] = Query(default=None),
+    cursor: Optional[str] = Query(default=None),
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    format: Literal["json", "ndjson"] = Query(default="json"),
+    if_none_match: Optional[str] = Header(default=None),
+):
+    position = parse_cursor(cursor)
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_books(name, author, year, position, limit),
+            media_type="application/x-ndjson",
+        )
+    limit = limit or DEFAULT_PAGE_SIZE
+    version = repository.version
+    key = (name, author, year, position, limit)
+    entry = response_cache.get(version, key)
+    if entry is None:
+        books, next_cursor = await repository.list_books(
+            name=name, author=author, year=year, cursor=position, limit=limit
+        )
+        headers = {"ETag": response_cache.etag(version)}
+        if next_cursor is not None:
+            headers["X-Next-Cursor"] = str(next_cursor)
+        entry = books_adapter.dump_json(books), headers
+        # A write that landed while the page was read would not match the version.
+        if repository.version == version:
+            response_cache.put(version, key, *entry)
+    body, headers = entry
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get(
+    "/books/{book_id}",
+    description="Get a book by ID. The ETag header carries the book version",
+    response_description="Book details",
+    response_model=Book,
+    status_code=200,
+)
+async def get_book(response: Response, book_id: UUID = Path()):
+    book = await repository.get(book_id)
+    if book is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    response.headers["ETag"] = record_etag(book)
+    return book
 
 
 @app.post(
@@ -29,44 +152,108 @@ async def get_books(name: Optional[str] = Query(default=None)):
     response_model=Book,
     status_code=201,
 )
-async def create_book(book: CreateBook = Body()):
-    books = await load_books()
+async def create_book(response: Response, book: CreateBook = Body()):
     new_book_id = uuid4()
-    book = Book(**book.model_dump(), id=new_book_id)
-    books.append(book)
-    await save_books(books)
+    book = await repository.add(Book(**book.model_dump(), id=new_book_id))
+    response.headers["ETag"] = record_etag(book)
     return book
 
 
 @app.put(
     "/books/{book_id}",
-    description="Update an existing book by ID",
+    description=(
+        "Update an existing book by ID. Pass the book ETag in If-Match to "
+        "update only if nobody changed it in the meantime"
+    ),
     response_description="Updated book details",
     response_model=Book,
     status_code=200,
 )
-async def update_book(book_id: UUID = Path(), updated_book: UpdateBook = Body()):
-    books = await load_books()
-    for index, book in enumerate(books):
-        if book.id == book_id:
-            books[index] = Book(**updated_book.model_dump(), id=book_id)
-            await save_books(books)
-            return books[index]
-    raise HTTPException(status_code=404, detail="Book not found")
+async def update_book(
+    response: Response,
+    book_id: UUID = Path(),
+    updated_book: UpdateBook = Body(),
+    if_match: Optional[str] = Header(default=None),
+):
+    book = Book(**updated_book.model_dump(), id=book_id)
+    try:
+        book = await repository.update(book, parse_if_match(if_match))
+    except BookNotFoundError:
+        raise HTTPException(status_code=404, detail="Book not found")
+    except VersionConflictError:
+        raise HTTPException(status_code=412, detail="Book was modified")
+    response.headers["ETag"] = record_etag(book)
+    return book
 
 
 @app.delete(
     "/books/{book_id}",
-    description="Delete a book by ID",
+    description=(
+        "Delete a book by ID. Pass the book ETag in If-Match to delete only if "
+        "nobody changed it in the meantime"
+    ),
     response_description="Deletion confirmation",
     response_model=SuccessMessage,
     status_code=200,
 )
-async def delete_book(book_id: UUID = Path()):
-    books = await load_books()
-    for index, book in enumerate(books):
-        if book.id == book_id:
-            del books[index]
-            await save_books(books)
-            return SuccessMessage(message="Book was successfully deleted")
-    raise HTTPException(status_code=404, detail="Book not found")
+async def delete_book(
+    book_id: UUID = Path(), if_match: Optional[str] = Header(default=None)
+):
+    try:
+        await repository.delete(book_id, parse_if_match(if_match))
+    except BookNotFoundError:
+        raise HTTPException(status_code=404, detail="Book not found")
+    except VersionConflictError:
+        raise HTTPException(status_code=412, detail="Book was modified")
+    return SuccessMessage(message="Book was successfully deleted")
+
+
+@app.post(
+    "/books:batch",
+    description=(
+        "Create, update and delete many books in one request. The batch is "
+        "applied atomically: if any item is rejected nothing is changed"
+    ),
+    response_description="Per-item results",
+    response_model=BatchResult,
+    status_code=200,
+)
+async def batch_books(response: Response, batch: BatchRequest = Body()):
+    books = [Book(**book.model_dump(), id=uuid4()) for book in batch.create]
+    books += [Book(**book.model_dump()) for book in batch.update]
+    deleted_ids = batch.delete
+    results = [
+        BatchItemResult(operation="create", index=index, id=book.id, status_code=201)
+        for index, book in enumerate(books[: len(batch.create)])
+    ]
+    results += [
+        BatchItemResult(operation="update", index=index, id=book.id, status_code=200)
+        for index, book in enumerate(books[len(batch.create) :])
+    ]
+    results += [
+        BatchItemResult(operation="delete", index=index, id=book_id, status_code=200)
+        for index, book_id in enumerate(deleted_ids)
+    ]
+
+    seen_ids = set()
+    for result in results[len(batch.create) :]:
+        if result.id in seen_ids:
+            result.status_code = 409
+            result.detail = "Book is referenced more than once in the batch"
+        seen_ids.add(result.id)
+    if all(result.status_code < 400 for result in results):
+        missing_ids = await repository.apply_batch(
+            books, deleted_ids, existing_ids=seen_ids
+        )
+        for result in results:
+            if result.id in missing_ids:
+                result.status_code = 404
+                result.detail = "Book not found"
+    applied = all(result.status_code < 400 for result in results)
+    if not applied:
+        response.status_code = 409
+        for result in results:
+            if result.status_code < 400:
+                result.status_code = 424
+                result.detail = "Not applied because other items were rejected"
+    return BatchResult(applied=applied, results=results)
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+from typing import Hashable, Optional
+from uuid import uuid4
+
+CACHE_SIZE = 128  # entries
+
+
+class ResponseCache:
+    """LRU of encoded responses valid for one catalog version.
+
+    The catalog version is bumped by every write, so entries of older versions
+    are never served again and are dropped the first time a newer one is stored.
+    """
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self._max_entries = max_entries
+        self._entries: OrderedDict[Hashable, tuple[bytes, dict[str, str]]] = (
+            OrderedDict()
+        )
+        self._version: Optional[int] = None
+        # Versions restart from zero with the process; the epoch keeps ETags
+        # handed out by a previous process from matching by accident.
+        self._epoch = uuid4().hex[:8]
+
+    def etag(self, version: int) -> str:
+        return f'"{self._epoch}-{version}"'
+
+    def get(
+        self, version: int, key: Hashable
+    ) -> Optional[tuple[bytes, dict[str, str]]]:
+        if version != self._version:
+            return None
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, version: int, key: Hashable, body: bytes, headers: dict[str, str]):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+        self._entries[key] = (body, headers)
+        if len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
@@ -0,0 +1,127 @@
+import aiofiles
+import asyncio
+import json
+import os
+from typing import Optional
+from uuid import UUID
+from .schemas import Book
+from .utils import (
+    DATA_FILE,
+    JOURNAL_FILE,
+    book_from_dict,
+    book_to_dict,
+    load_books,
+    save_books,
+)
+
+COMPACT_THRESHOLD = 10_000  # journal records
+
+
+class BookJournal:
+    """Append-only change log on top of a books.json snapshot.
+
+    Every commit is a single JSON line ``{"put": [...], "delete": [...]}``, so a
+    multi-book change is applied entirely or not at all on replay. A line cut
+    short by a crash is dropped and truncated away when the journal is opened.
+    Compaction moves the active journal aside, writes a fresh snapshot and only
+    then removes the old journal; replaying it again on top of the new snapshot
+    is harmless because every record sets the final state of the books it names.
+    """
+
+    def __init__(
+        self,
+        snapshot_file: str = DATA_FILE,
+        journal_file: str = JOURNAL_FILE,
+        compact_threshold: int = COMPACT_THRESHOLD,
+        fsync: bool = False,
+    ):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.compacting_file = f"{journal_file}.compacting"
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self.records = 0
+        self._file = None
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self.records >= self.compact_threshold
+
+    async def open(self) -> dict[UUID, Book]:
+        books = {book.id: book for book in await load_books(self.snapshot_file)}
+        for path in (self.compacting_file, self.journal_file):
+            self.records += await self._replay(path, books)
+        self._file = await aiofiles.open(self.journal_file, "ab")
+        if os.path.exists(self.compacting_file):
+            # The previous process died mid-compaction: finish it now.
+            await self.rotate()
+            await self.compact(list(books.values()))
+        return books
+
+    async def close(self):
+        if self._file is not None:
+            await self._file.close()
+            self._file = None
+
+    async def append(self, changesets: list[dict[UUID, Optional[Book]]]):
+        # One write and one flush (and fsync) for a whole group of commits.
+        lines = []
+        for changes in changesets:
+            record = {
+                "put": [
+                    book_to_dict(book) for book in changes.values() if book is not None
+                ],
+                "delete": [
+                    str(book_id) for book_id, book in changes.items() if book is None
+                ],
+            }
+            lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+        await self._file.write("".join(lines).encode("utf-8"))
+        await self._file.flush()
+        if self.fsync:
+            await asyncio.to_thread(os.fsync, self._file.fileno())
+        self.records += len(changesets)
+
+    async def rotate(self):
+        # Called by the repository while no commit is in flight, so the moved
+        # journal covers exactly the state handed to compact().
+        await self._file.close()
+        if not os.path.exists(self.compacting_file):
+            os.replace(self.journal_file, self.compacting_file)
+        else:
+            await self._merge_into_compacting()
+        self._file = await aiofiles.open(self.journal_file, "ab")
+        self.records = 0
+
+    async def compact(self, books: list[Book]):
+        await save_books(books, self.snapshot_file)
+        os.remove(self.compacting_file)
+
+    async def _merge_into_compacting(self):
+        async with aiofiles.open(self.journal_file, "rb") as src:
+            content = await src.read()
+        async with aiofiles.open(self.compacting_file, "ab") as dst:
+            await dst.write(content)
+        os.remove(self.journal_file)
+
+    async def _replay(self, path: str, books: dict[UUID, Book]) -> int:
+        if not os.path.exists(path):
+            return 0
+        async with aiofiles.open(path, "rb") as f:
+            content = await f.read()
+        valid_length = content.rfind(b"\n") + 1
+        if valid_length < len(content):
+            # Torn tail from a crash during append: the write was never acknowledged.
+            os.truncate(path, valid_length)
+        records = 0
+        for line in content[:valid_length].splitlines():
+            if not line:
+                continue
+            record = json.loads(line)
+            for raw_data in record["put"]:
+                book = book_from_dict(raw_data)
+                books[book.id] = book
+            for book_id in record["delete"]:
+                books.pop(UUID(book_id), None)
+            records += 1
+        return records
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right
+from typing import AsyncIterator, Optional
+from uuid import UUID
+from .journal import BookJournal
+from .schemas import Book
+from .search import BookSearchIndex
+from .storage import STREAM_BATCH_SIZE, BookStorage, Changes, Mutation, Outcomes, stage
+from .utils import load_books, save_books
+
+FLUSH_INTERVAL = 0.5  # seconds
+FLUSH_RETRY_INTERVAL = 5  # seconds
+
+logger = logging.getLogger(__name__)
+
+
+class BookRepository(BookStorage):
+    """In-memory catalog keyed by id, backed by books.json.
+
+    Without a journal the whole catalog is persisted by a write-behind flusher
+    task. With a journal every write is appended before it is acknowledged,
+    with queued writes sharing one append, and the flusher only compacts the
+    journal into a fresh snapshot.
+    """
+
+    def __init__(
+        self,
+        journal: Optional[BookJournal] = None,
+        flush_interval: float = FLUSH_INTERVAL,
+    ):
+        super().__init__()
+        self._journal = journal
+        self._flush_interval = flush_interval
+        self._books: dict[UUID, Book] = {}
+        # Every book gets an increasing position on insert. Listings are ordered
+        # by it and cursors point at it, so pages stay stable under writes.
+        self._positions: dict[UUID, int] = {}
+        self._ordered_positions: list[int] = []
+        self._ordered_ids: list[UUID] = []
+        self._next_position = 0
+        self._index = BookSearchIndex()
+        self._dirty = False
+        self._commit_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def open(self):
+        if self._journal is not None:
+            books = await self._journal.open()
+        else:
+            books = {book.id: book for book in await load_books()}
+        for book in books.values():
+            self._insert(book)
+        await super().open()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        await super().close()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._journal is not None:
+            if self._journal.records:
+                await self.compact()
+            await self._journal.close()
+        else:
+            await self.flush()
+
+    async def get(self, book_id: UUID) -> Optional[Book]:
+        return self._books.get(book_id)
+
+    async def list_books(
+        self,
+        name: Optional[str] = None,
+        author: Optional[str] = None,
+        year: Optional[int] = None,
+        cursor: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> tuple[list[Book], Optional[int]]:
+        book_ids = self._index.search(name=name, author=author, year=year)
+        if book_ids is None:
+            start = 0
+            if cursor is not None:
+                start = bisect_right(self._ordered_positions, cursor)
+            end = len(self._ordered_ids) if limit is None else start + limit
+            page = self._ordered_ids[start:end]
+            has_more = end < len(self._ordered_ids)
+        else:
+            ordered = self._sorted_by_position(book_ids, cursor)
+            page = ordered if limit is None else ordered[:limit]
+            has_more = len(page) < len(ordered)
+        next_cursor = self._positions[page[-1]] if has_more else None
+        return [self._books[book_id] for book_id in page], next_cursor
+
+    async def iter_books(
+        self,
+        name: Optional[str] = None,
+        author: Optional[str] = None,
+        year: Optional[int] = None,
+        cursor: Optional[int] = None,
+        batch_size: int = STREAM_BATCH_SIZE,
+    ) -> AsyncIterator[list[Book]]:
+        book_ids = self._index.search(name=name, author=author, year=year)
+        if book_ids is None:
+            async for books in super().iter_books(cursor=cursor, batch_size=batch_size):
+                yield books
+            return
+        # Resolve the filter once instead of once per batch.
+        ordered = self._sorted_by_position(book_ids, cursor)
+        for start in range(0, len(ordered), batch_size):
+            batch = ordered[start : start + batch_size]
+            # Skip books deleted while the response was being streamed.
+            yield [self._books[i] for i in batch if i in self._books]
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        try:
+            await save_books(list(self._books.values()))
+        except BaseException:
+            self._dirty = True
+            raise
+
+    async def compact(self):
+        async with self._commit_lock:
+            await self._journal.rotate()
+            books = list(self._books.values())
+        await self._journal.compact(books)
+
+    async def _commit_group(self, mutations: list[Mutation]) -> Outcomes:
+        async with self._commit_lock:
+            outcomes, changesets = stage(mutations, self._books.get)
+            if self._journal is not None and changesets:
+                await self._journal.append(changesets)
+            for changes in changesets:
+                self._apply(changes)
+        return outcomes
+
+    def _apply(self, changes: Changes):
+        for book_id, book in changes.items():
+            if book is None:
+                self._remove(book_id)
+            else:
+                self._insert(book)
+        self.version += 1
+        self._dirty = True
+        self._wakeup.set()
+
+    def _insert(self, book: Book):
+        if book.id in self._books:
+            self._index.remove(self._books[book.id])
+        else:
+            self._positions[book.id] = self._next_position
+            self._ordered_positions.append(self._next_position)
+            self._ordered_ids.append(book.id)
+            self._next_position += 1
+        self._books[book.id] = book
+        self._index.add(book)
+
+    def _remove(self, book_id: UUID):
+        self._index.remove(self._books.pop(book_id))
+        position = self._positions.pop(book_id)
+        index = bisect_left(self._ordered_positions, position)
+        del self._ordered_positions[index]
+        del self._ordered_ids[index]
+
+    def _sorted_by_position(
+        self, book_ids: set[UUID], cursor: Optional[int]
+    ) -> list[UUID]:
+        if cursor is not None:
+            book_ids = {i for i in book_ids if self._positions[i] > cursor}
+        return sorted(book_ids, key=self._positions.__getitem__)
+
+    async def _flush_loop(self):
+        while True:
+            await self._wakeup.wait()
+            # Let writes arriving during the interval coalesce into one rewrite.
+            await asyncio.sleep(self._flush_interval)
+            self._wakeup.clear()
+            try:
+                if self._journal is None:
+                    await self.flush()
+                elif self._journal.needs_compaction:
+                    await self.compact()
+            except Exception:
+                # Disk full, permissions...: keep the changes and try again
+                # later instead of losing the flusher until shutdown.
+                logger.exception("Saving books failed")
+                await asyncio.sleep(FLUSH_RETRY_INTERVAL)
+                self._wakeup.set()
@@ -1,3 +1,4 @@
+from typing import List, Literal, Optional
 from uuid import uuid4, UUID
 from pydantic import BaseModel, Field
 
@@ -15,6 +16,7 @@ class BaseBook(BaseModel):
 
 class Book(BaseBook):
     id: UUID = Field(examples=[uuid4()])
+    version: int = Field(default=1, examples=[1])
 
 
 class CreateBook(BaseBook): ...
@@ -25,3 +27,26 @@ class UpdateBook(BaseBook): ...
 
 class SuccessMessage(BaseModel):
     message: str = Field(examples=["Операция успешно выполнена"])
+
+
+class BatchUpdateBook(UpdateBook):
+    id: UUID = Field(examples=[uuid4()])
+
+
+class BatchRequest(BaseModel):
+    create: List[CreateBook] = Field(default_factory=list)
+    update: List[BatchUpdateBook] = Field(default_factory=list)
+    delete: List[UUID] = Field(default_factory=list)
+
+
+class BatchItemResult(BaseModel):
+    operation: Literal["create", "update", "delete"]
+    index: int = Field(examples=[0])
+    id: UUID = Field(examples=[uuid4()])
+    status_code: int = Field(examples=[201])
+    detail: Optional[str] = Field(default=None, examples=["Book not found"])
+
+
+class BatchResult(BaseModel):
+    applied: bool
+    results: List[BatchItemResult]
@@ -0,0 +1,99 @@
+from collections import defaultdict
+from typing import Iterable, Optional
+from uuid import UUID
+from .schemas import Book
+
+NGRAM_SIZE = 3
+
+
+def fold(text: str) -> str:
+    # casefold() is the Unicode-aware lower(): it handles Cyrillic and
+    # special cases such as "ß" that lower() leaves untouched.
+    return text.casefold()
+
+
+def ngrams(text: str) -> set[str]:
+    return {text[i : i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class TrigramIndex:
+    """Inverted index from character trigrams to the keys whose text contains them."""
+
+    def __init__(self):
+        self._postings: dict[str, set[UUID]] = defaultdict(set)
+        self._texts: dict[UUID, str] = {}
+
+    def add(self, key: UUID, text: str):
+        folded = fold(text)
+        self._texts[key] = folded
+        for gram in ngrams(folded):
+            self._postings[gram].add(key)
+
+    def remove(self, key: UUID):
+        folded = self._texts.pop(key, None)
+        if folded is None:
+            return
+        for gram in ngrams(folded):
+            postings = self._postings[gram]
+            postings.discard(key)
+            if not postings:
+                del self._postings[gram]
+
+    def search(self, query: str, keys: Optional[Iterable[UUID]] = None) -> set[UUID]:
+        folded = fold(query)
+        grams = ngrams(folded)
+        if keys is None and not grams:
+            # Queries shorter than a trigram cannot use the index; the folded
+            # texts are still cached, so the scan does no per-request lowering.
+            keys = self._texts.keys()
+        if keys is None:
+            candidates = None
+            # Start from the rarest trigram so the intersection shrinks fastest.
+            for gram in sorted(grams, key=lambda g: len(self._postings.get(g, ()))):
+                postings = self._postings.get(gram)
+                if not postings:
+                    return set()
+                if candidates is None:
+                    candidates = set(postings)
+                else:
+                    candidates &= postings
+                if not candidates:
+                    return set()
+            keys = candidates
+        # Trigrams only prove the pieces are present, verify the whole substring.
+        return {key for key in keys if folded in self._texts[key]}
+
+
+class BookSearchIndex:
+    def __init__(self):
+        self._names = TrigramIndex()
+        self._authors = TrigramIndex()
+        self._years: dict[int, set[UUID]] = defaultdict(set)
+
+    def add(self, book: Book):
+        self._names.add(book.id, book.name)
+        self._authors.add(book.id, book.author)
+        self._years[book.year].add(book.id)
+
+    def remove(self, book: Book):
+        self._names.remove(book.id)
+        self._authors.remove(book.id)
+        books = self._years[book.year]
+        books.discard(book.id)
+        if not books:
+            del self._years[book.year]
+
+    def search(
+        self,
+        name: Optional[str] = None,
+        author: Optional[str] = None,
+        year: Optional[int] = None,
+    ) -> Optional[set[UUID]]:
+        # None means "no filter"; an empty set means "nothing matched".
+        keys = self._names.search(name) if name else None
+        if year is not None:
+            books = self._years.get(year, set())
+            keys = set(books) if keys is None else keys & books
+        if author:
+            keys = self._authors.search(author, keys)
+        return keys
@@ -0,0 +1,269 @@
+import asyncio
+import os
+import queue
+import sqlite3
+from typing import Callable, Optional, TypeVar
+from uuid import UUID
+from .schemas import Book
+from .search import NGRAM_SIZE, fold
+from .storage import BookStorage, Changes, Mutation, Outcomes, stage
+from .utils import DATA_FILE, SQLITE_FILE, load_books
+
+POOL_SIZE = 4
+
+T = TypeVar("T")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    position INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    author TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    annotation TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    name_folded TEXT NOT NULL,
+    author_folded TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS books_year ON books (year);
+"""
+
+# Trigram full-text index for substring search, kept in sync by triggers.
+# Needs SQLite 3.34+; older builds fall back to scanning the folded columns.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE books_fts USING fts5(
+    name_folded, author_folded,
+    content='books', content_rowid='position', tokenize='trigram'
+);
+CREATE TRIGGER books_fts_insert AFTER INSERT ON books BEGIN
+    INSERT INTO books_fts (rowid, name_folded, author_folded)
+    VALUES (new.position, new.name_folded, new.author_folded);
+END;
+CREATE TRIGGER books_fts_delete AFTER DELETE ON books BEGIN
+    INSERT INTO books_fts (books_fts, rowid, name_folded, author_folded)
+    VALUES ('delete', old.position, old.name_folded, old.author_folded);
+END;
+CREATE TRIGGER books_fts_update AFTER UPDATE ON books BEGIN
+    INSERT INTO books_fts (books_fts, rowid, name_folded, author_folded)
+    VALUES ('delete', old.position, old.name_folded, old.author_folded);
+    INSERT INTO books_fts (rowid, name_folded, author_folded)
+    VALUES (new.position, new.name_folded, new.author_folded);
+END;
+INSERT INTO books_fts (books_fts) VALUES ('rebuild');
+"""
+
+COLUMNS = "position, id, name, author, year, annotation, version"
+
+UPSERT = """
+INSERT INTO books (
+    id, name, author, year, annotation, version, name_folded, author_folded
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    name = excluded.name,
+    author = excluded.author,
+    year = excluded.year,
+    annotation = excluded.annotation,
+    version = excluded.version,
+    name_folded = excluded.name_folded,
+    author_folded = excluded.author_folded
+"""
+
+
+def connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, check_same_thread=False)
+    # WAL lets the pooled readers run while the committer writes.
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    return connection
+
+
+def row_to_book(row: tuple) -> Book:
+    _, book_id, name, author, year, annotation, version = row
+    return Book(
+        id=UUID(book_id),
+        name=name,
+        author=author,
+        year=year,
+        annotation=annotation,
+        version=version,
+    )
+
+
+def book_to_row(book: Book) -> tuple:
+    return (
+        str(book.id),
+        book.name,
+        book.author,
+        book.year,
+        book.annotation,
+        book.version,
+        fold(book.name),
+        fold(book.author),
+    )
+
+
+class ConnectionPool:
+    """Fixed set of connections used from worker threads, one caller at a time."""
+
+    def __init__(self, path: str, size: int = POOL_SIZE):
+        self._connections: queue.Queue[sqlite3.Connection] = queue.Queue()
+        for _ in range(size):
+            self._connections.put(connect(path))
+        self._size = size
+
+    async def run(self, work: Callable[[sqlite3.Connection], T]) -> T:
+        # sqlite3 calls block, so they never run on the event loop thread.
+        return await asyncio.to_thread(self._run, work)
+
+    def _run(self, work: Callable[[sqlite3.Connection], T]) -> T:
+        connection = self._connections.get()
+        try:
+            return work(connection)
+        finally:
+            self._connections.put(connection)
+
+    def close(self):
+        for _ in range(self._size):
+            self._connections.get().close()
+
+
+class SQLiteBookRepository(BookStorage):
+    """Book storage in a SQLite database with filtering and paging done in SQL.
+
+    Reads use a small connection pool; the committer owns a separate writer
+    connection and commits each group of queued writes in one transaction.
+    The AUTOINCREMENT rowid plays the role of the catalog position, so cursors
+    mean the same as with the in-memory repository.
+    """
+
+    def __init__(self, path: str = SQLITE_FILE, pool_size: int = POOL_SIZE):
+        super().__init__()
+        self._path = path
+        self._pool_size = pool_size
+        self._pool: Optional[ConnectionPool] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._fts = False
+
+    async def open(self):
+        self._writer = connect(self._path)
+        await asyncio.to_thread(self._create_schema)
+        if await asyncio.to_thread(self._is_empty) and os.path.exists(DATA_FILE):
+            # First start on an existing JSON catalog: import it.
+            books = await load_books()
+            await asyncio.to_thread(self._import, books)
+        self._pool = ConnectionPool(self._path, self._pool_size)
+        await super().open()
+
+    async def close(self):
+        await super().close()
+        self._pool.close()
+        self._writer.close()
+
+    async def get(self, book_id: UUID) -> Optional[Book]:
+        return await self._pool.run(lambda connection: self._get(connection, book_id))
+
+    async def list_books(
+        self,
+        name: Optional[str] = None,
+        author: Optional[str] = None,
+        year: Optional[int] = None,
+        cursor: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> tuple[list[Book], Optional[int]]:
+        def select(connection: sqlite3.Connection) -> list[tuple]:
+            sql, params = self._build_query(name, author, year, cursor, limit)
+            return connection.execute(sql, params).fetchall()
+
+        rows = await self._pool.run(select)
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1][0]
+        return [row_to_book(row) for row in rows], next_cursor
+
+    async def _commit_group(self, mutations: list[Mutation]) -> Outcomes:
+        outcomes, committed = await asyncio.to_thread(self._write_group, mutations)
+        self.version += committed
+        return outcomes
+
+    def _build_query(
+        self,
+        name: Optional[str],
+        author: Optional[str],
+        year: Optional[int],
+        cursor: Optional[int],
+        limit: Optional[int],
+    ) -> tuple[str, list]:
+        clauses, params = [], []
+        for column, query in (("name_folded", name), ("author_folded", author)):
+            if not query:
+                continue
+            folded = fold(query)
+            if self._fts and len(folded) >= NGRAM_SIZE:
+                clauses.append(
+                    f"position IN (SELECT rowid FROM books_fts WHERE {column} MATCH ?)"
+                )
+                params.append('"' + folded.replace('"', '""') + '"')
+            clauses.append(f"instr({column}, ?) > 0")
+            params.append(folded)
+        if year is not None:
+            clauses.append("year = ?")
+            params.append(year)
+        if cursor is not None:
+            clauses.append("position > ?")
+            params.append(cursor)
+        sql = f"SELECT {COLUMNS} FROM books"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY position"
+        if limit is not None:
+            # One extra row tells whether there is a next page.
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+        return sql, params
+
+    def _get(self, connection: sqlite3.Connection, book_id: UUID) -> Optional[Book]:
+        row = connection.execute(
+            f"SELECT {COLUMNS} FROM books WHERE id = ?", (str(book_id),)
+        ).fetchone()
+        return row_to_book(row) if row is not None else None
+
+    def _write_group(self, mutations: list[Mutation]) -> tuple[Outcomes, int]:
+        connection = self._writer
+        outcomes, changesets = stage(
+            mutations, lambda book_id: self._get(connection, book_id)
+        )
+        with connection:
+            for changes in changesets:
+                self._write_changes(connection, changes)
+        return outcomes, len(changesets)
+
+    def _write_changes(self, connection: sqlite3.Connection, changes: Changes):
+        connection.executemany(
+            UPSERT, [book_to_row(book) for book in changes.values() if book is not None]
+        )
+        connection.executemany(
+            "DELETE FROM books WHERE id = ?",
+            [(str(book_id),) for book_id, book in changes.items() if book is None],
+        )
+
+    def _create_schema(self):
+        connection = self._writer
+        connection.executescript(SCHEMA)
+        exists = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'books_fts'"
+        ).fetchone()
+        if not exists:
+            try:
+                connection.executescript(FTS_SCHEMA)
+            except sqlite3.OperationalError:
+                return
+        self._fts = True
+
+    def _is_empty(self) -> bool:
+        return self._writer.execute("SELECT 1 FROM books LIMIT 1").fetchone() is None
+
+    def _import(self, books: list[Book]):
+        with self._writer:
+            self._write_changes(self._writer, {book.id: book for book in books})
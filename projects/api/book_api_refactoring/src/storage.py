@@ -0,0 +1,189 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Callable, Optional
+from uuid import UUID
+from .schemas import Book
+
+COMMIT_GROUP_SIZE = 256
+STREAM_BATCH_SIZE = 500
+
+Lookup = Callable[[UUID], Optional[Book]]
+Changes = dict[UUID, Optional[Book]]
+Mutation = Callable[[Lookup], tuple[Changes, Any]]
+# (result, error) of every mutation in a group, in queue order.
+Outcomes = list[tuple[Any, Optional[Exception]]]
+
+
+class BookNotFoundError(Exception): ...
+
+
+class VersionConflictError(Exception): ...
+
+
+def stage(mutations: list[Mutation], lookup: Lookup) -> tuple[Outcomes, list[Changes]]:
+    """Run a group of mutations against committed state plus earlier ones.
+
+    Later mutations must see the changes of earlier ones before any of them is
+    visible to readers, so they are evaluated against a staging overlay.
+    """
+    staged: Changes = {}
+
+    def staged_lookup(book_id: UUID) -> Optional[Book]:
+        if book_id in staged:
+            return staged[book_id]
+        return lookup(book_id)
+
+    outcomes: Outcomes = []
+    changesets: list[Changes] = []
+    for mutation in mutations:
+        try:
+            changes, result = mutation(staged_lookup)
+        except Exception as error:
+            outcomes.append((None, error))
+            continue
+        staged.update(changes)
+        outcomes.append((result, None))
+        if changes:
+            changesets.append(changes)
+    return outcomes, changesets
+
+
+class BookStorage(ABC):
+    """Interface of the book storage backends.
+
+    Reads go straight to the backend. Writes are queued and applied by a single
+    committer task in groups, which lets the backend persist a group at once
+    and keeps concurrent writers from overwriting each other's changes.
+    Backends implement the read methods and ``_commit_group``.
+    """
+
+    def __init__(self):
+        # Bumped by every write, lets readers cache results per catalog state.
+        self.version = 0
+        self._commits: asyncio.Queue[tuple[Mutation, asyncio.Future]] = asyncio.Queue()
+        self._committer: Optional[asyncio.Task] = None
+
+    async def open(self):
+        self._committer = asyncio.create_task(self._commit_loop())
+
+    async def close(self):
+        await self._commits.join()
+        if self._committer is not None:
+            self._committer.cancel()
+            try:
+                await self._committer
+            except asyncio.CancelledError:
+                pass
+            self._committer = None
+
+    @abstractmethod
+    async def get(self, book_id: UUID) -> Optional[Book]: ...
+
+    @abstractmethod
+    async def list_books(
+        self,
+        name: Optional[str] = None,
+        author: Optional[str] = None,
+        year: Optional[int] = None,
+        cursor: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> tuple[list[Book], Optional[int]]:
+        """Return the page of books after ``cursor`` and the next page's cursor."""
+
+    async def iter_books(
+        self,
+        name: Optional[str] = None,
+        author: Optional[str] = None,
+        year: Optional[int] = None,
+        cursor: Optional[int] = None,
+        batch_size: int = STREAM_BATCH_SIZE,
+    ) -> AsyncIterator[list[Book]]:
+        while True:
+            books, cursor = await self.list_books(
+                name, author, year, cursor, batch_size
+            )
+            if books:
+                yield books
+            if cursor is None:
+                return
+
+    async def add(self, book: Book) -> Book:
+        def mutation(lookup: Lookup) -> tuple[Changes, Book]:
+            return {book.id: book}, book
+
+        return await self._commit(mutation)
+
+    async def update(self, book: Book, expected_version: Optional[int] = None) -> Book:
+        def mutation(lookup: Lookup) -> tuple[Changes, Book]:
+            current = lookup(book.id)
+            if current is None:
+                raise BookNotFoundError(book.id)
+            if expected_version is not None and current.version != expected_version:
+                raise VersionConflictError(book.id)
+            updated = book.model_copy(update={"version": current.version + 1})
+            return {book.id: updated}, updated
+
+        return await self._commit(mutation)
+
+    async def delete(self, book_id: UUID, expected_version: Optional[int] = None):
+        def mutation(lookup: Lookup) -> tuple[Changes, None]:
+            current = lookup(book_id)
+            if current is None:
+                raise BookNotFoundError(book_id)
+            if expected_version is not None and current.version != expected_version:
+                raise VersionConflictError(book_id)
+            return {book_id: None}, None
+
+        await self._commit(mutation)
+
+    async def apply_batch(
+        self, books: list[Book], deleted_ids: list[UUID], existing_ids: set[UUID]
+    ) -> set[UUID]:
+        """Commit all changes at once if every id in ``existing_ids`` is present.
+
+        Returns the missing ids; nothing is applied unless that set is empty.
+        """
+
+        def mutation(lookup: Lookup) -> tuple[Changes, set[UUID]]:
+            missing = {book_id for book_id in existing_ids if lookup(book_id) is None}
+            if missing:
+                return {}, missing
+            changes: Changes = {}
+            for book in books:
+                current = lookup(book.id)
+                if current is not None:
+                    book = book.model_copy(update={"version": current.version + 1})
+                changes[book.id] = book
+            changes.update(dict.fromkeys(deleted_ids))
+            return changes, missing
+
+        return await self._commit(mutation)
+
+    async def _commit(self, mutation: Mutation) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        await self._commits.put((mutation, future))
+        return await future
+
+    async def _commit_loop(self):
+        while True:
+            group = [await self._commits.get()]
+            while len(group) < COMMIT_GROUP_SIZE and not self._commits.empty():
+                group.append(self._commits.get_nowait())
+            mutations = [mutation for mutation, _ in group]
+            try:
+                outcomes = await self._commit_group(mutations)
+            except Exception as error:
+                outcomes = [(None, error)] * len(group)
+            for (_, future), (result, error) in zip(group, outcomes):
+                # The caller may have gone away; its change is committed anyway.
+                if future.done():
+                    pass
+                elif error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+                self._commits.task_done()
+
+    @abstractmethod
+    async def _commit_group(self, mutations: list[Mutation]) -> Outcomes:
+        """Apply a group of mutations at once, in order, and persist them."""
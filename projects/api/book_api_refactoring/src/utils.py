@@ -1,28 +1,48 @@
 import aiofiles
+import asyncio
 import json
 import os
 from uuid import UUID
 from .schemas import Book
 
 DATA_FILE = "../books.json"
+JOURNAL_FILE = "../books.journal"
+SQLITE_FILE = "../books.sqlite3"
+# snapshot | journal | sqlite
+STORAGE_MODE = os.getenv("BOOKS_STORAGE_MODE", "snapshot")
 
 
-async def load_books() -> list[Book]:
+def book_to_dict(book: Book) -> dict:
+    return {**book.model_dump(exclude={"id"}), "id": str(book.id)}
+
+
+def book_from_dict(raw_data: dict) -> Book:
+    book_id = UUID(raw_data["id"])
+    updated_raw_data = {**raw_data, "id": book_id}
+    return Book(**updated_raw_data)
+
+
+async def load_books(data_file: str = DATA_FILE) -> list[Book]:
     books = []
-    if not os.path.exists(DATA_FILE):
+    if not os.path.exists(data_file):
         return books
-    async with aiofiles.open(DATA_FILE, "r", encoding="utf-8") as f:
+    async with aiofiles.open(data_file, "r", encoding="utf-8") as f:
         content = await f.read()
         raw_list = json.loads(content)
     for raw_data in raw_list:
-        book_id = UUID(raw_data["id"])
-        updated_raw_data = {**raw_data, "id": book_id}
-        books.append(Book(**updated_raw_data))
+        books.append(book_from_dict(raw_data))
     return books
 
 
-async def save_books(books: list[Book]):
-    data = [{**book.model_dump(exclude={"id"}), "id": str(book.id)} for book in books]
-    async with aiofiles.open(DATA_FILE, "w", encoding="utf-8") as f:
-        content = json.dumps(data, indent=4)
+def dump_books(books: list[Book]) -> str:
+    data = [book_to_dict(book) for book in books]
+    return json.dumps(data, indent=4)
+
+
+async def save_books(books: list[Book], data_file: str = DATA_FILE):
+    # Serializing a large catalog is CPU-bound, keep it off the event loop.
+    content = await asyncio.to_thread(dump_books, books)
+    tmp_file = f"{data_file}.tmp"
+    async with aiofiles.open(tmp_file, "w", encoding="utf-8") as f:
         await f.write(content)
+    os.replace(tmp_file, data_file)
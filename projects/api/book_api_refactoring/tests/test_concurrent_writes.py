@@ -0,0 +1,80 @@
+import asyncio
+import importlib
+import httpx
+import pytest
+from projects.api.book_api_refactoring.src.cache import ResponseCache
+from projects.api.book_api_refactoring.src.journal import BookJournal
+from projects.api.book_api_refactoring.src.repository import BookRepository
+from projects.api.book_api_refactoring.src.sqlite_storage import (
+    SQLiteBookRepository,
+)
+
+WRITERS = 20
+INCREMENTS = 10  # per writer
+CREATES = 1000
+# The package re-exports the FastAPI app under the module's name.
+app_module = importlib.import_module("projects.api.book_api_refactoring.src.app")
+BOOK = {"name": "Счётчик", "author": "Стресс-тест", "year": 0, "annotation": ""}
+
+REPOSITORIES = {
+    "snapshot": lambda: BookRepository(),
+    "journal": lambda: BookRepository(journal=BookJournal()),
+    "sqlite": lambda: SQLiteBookRepository(),
+}
+
+
+@pytest.fixture(params=REPOSITORIES)
+def repository(request, tmp_path, monkeypatch):
+    # The storage files live in the parent of the working directory.
+    (tmp_path / "run").mkdir()
+    monkeypatch.chdir(tmp_path / "run")
+    repository = REPOSITORIES[request.param]()
+    monkeypatch.setattr(app_module, "repository", repository)
+    monkeypatch.setattr(app_module, "response_cache", ResponseCache())
+    return repository
+
+
+async def increment_year(client: httpx.AsyncClient, book_id: str) -> int:
+    conflicts = 0
+    for _ in range(INCREMENTS):
+        while True:
+            response = await client.get(f"/books/{book_id}")
+            book = response.json()
+            book["year"] += 1
+            response = await client.put(
+                f"/books/{book_id}",
+                json=book,
+                headers={"If-Match": response.headers["ETag"]},
+            )
+            if response.status_code == 200:
+                break
+            assert response.status_code == 412, response.text
+            conflicts += 1
+    return conflicts
+
+
+def test_no_lost_updates_or_creates(repository):
+    async def main():
+        app = app_module.app
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                book_id = (await client.post("/books", json=BOOK)).json()["id"]
+                await asyncio.gather(
+                    *(increment_year(client, book_id) for _ in range(WRITERS))
+                )
+                final = (await client.get(f"/books/{book_id}")).json()
+
+                responses = await asyncio.gather(
+                    *(client.post("/books", json=BOOK) for _ in range(CREATES))
+                )
+                created = {response.json()["id"] for response in responses}
+                books, _ = await repository.list_books(author="Стресс")
+                stored = {str(book.id) for book in books}
+        return final, created, stored
+
+    final, created, stored = asyncio.run(main())
+    assert final["year"] == WRITERS * INCREMENTS, "lost update"
+    assert len(created) == CREATES and created <= stored, "lost create"
@@ -0,0 +1,214 @@
+import asyncio
+import os
+from dataclasses import dataclass
+from uuid import uuid4
+import pytest
+from projects.api.book_api_refactoring.src.journal import BookJournal
+from projects.api.book_api_refactoring.src.schemas import Book
+from projects.api.book_api_refactoring.src.utils import load_books, save_books
+
+# Each test lays out on disk a state a crash can leave the journal in (a torn
+# append, every step of a compaction) and checks that opening the journal
+# recovers exactly the acknowledged books and leaves clean files behind.
+
+
+def make_book(name: str, year: int = 2000) -> Book:
+    return Book(id=uuid4(), name=name, author="Проверка", year=year, annotation="")
+
+
+def apply(books: dict, changesets: list[dict]) -> dict:
+    books = dict(books)
+    for changes in changesets:
+        for book_id, book in changes.items():
+            if book is None:
+                books.pop(book_id, None)
+            else:
+                books[book_id] = book
+    return books
+
+
+async def encode(directory: str, changesets: list[dict]) -> bytes:
+    """Journal lines of ``changesets``, as BookJournal.append writes them."""
+    os.makedirs(directory)
+    journal = BookJournal(
+        os.path.join(directory, "books.json"), os.path.join(directory, "j")
+    )
+    await journal.open()
+    await journal.append(changesets)
+    await journal.close()
+    with open(journal.journal_file, "rb") as f:
+        return f.read()
+
+
+@dataclass
+class History:
+    snapshot: list[Book]
+    # Before compaction: r1, r2 in j1. After the journal is moved aside: r3 in j2.
+    j1: bytes
+    j2: bytes
+    torn: bytes
+    after_j1: dict
+    after_j2: dict
+    r3: dict
+
+
+@pytest.fixture(scope="module")
+def history(tmp_path_factory) -> History:
+    directory = str(tmp_path_factory.mktemp("encode"))
+    first, second, third = make_book("Первая"), make_book("Вторая"), make_book("Третья")
+    r1 = {third.id: third}
+    r2 = {
+        first.id: first.model_copy(update={"year": 2001, "version": 2}),
+        second.id: None,
+    }
+    r3 = {third.id: third.model_copy(update={"year": 2002, "version": 2})}
+
+    async def encode_all():
+        return (
+            await encode(os.path.join(directory, "1"), [r1, r2]),
+            await encode(os.path.join(directory, "2"), [r3]),
+            await encode(os.path.join(directory, "3"), [{second.id: second}]),
+        )
+
+    j1, j2, whole = asyncio.run(encode_all())
+    snapshot = [first, second]
+    after_j1 = apply({book.id: book for book in snapshot}, [r1, r2])
+    return History(snapshot, j1, j2, whole[:-7], after_j1, apply(after_j1, [r3]), r3)
+
+
+class Files:
+    def __init__(self, directory):
+        self.snapshot_file = os.path.join(directory, "books.json")
+        self.journal_file = os.path.join(directory, "books.journal")
+        self.compacting_file = f"{self.journal_file}.compacting"
+
+    def write(self, path: str, content: bytes):
+        with open(path, "wb") as f:
+            f.write(content)
+
+    def journal(self) -> BookJournal:
+        return BookJournal(self.snapshot_file, self.journal_file)
+
+
+async def recover(files: Files, expected: dict, records: int = None):
+    journal = files.journal()
+    assert await journal.open() == expected
+    if records is not None:
+        assert journal.records == records
+    await journal.close()
+    assert not os.path.exists(files.compacting_file)
+    with open(files.journal_file, "rb") as f:
+        content = f.read()
+    assert not content or content.endswith(b"\n"), "torn journal left"
+
+    # Opening again, as after a second crash, changes nothing.
+    journal = files.journal()
+    assert await journal.open() == expected
+    await journal.close()
+
+
+@pytest.fixture
+def files(tmp_path) -> Files:
+    return Files(str(tmp_path))
+
+
+def test_torn_tail_record(files, history):
+    asyncio.run(save_books(history.snapshot, files.snapshot_file))
+    files.write(files.journal_file, history.j1 + history.torn)
+    asyncio.run(recover(files, history.after_j1, records=2))
+
+
+def test_append_after_truncated_tail(files, history):
+    async def main():
+        await save_books(history.snapshot, files.snapshot_file)
+        files.write(files.journal_file, history.j1 + history.torn)
+        journal = files.journal()
+        await journal.open()
+        # Cut back to the last whole record, so the next append starts a line.
+        assert os.path.getsize(files.journal_file) == len(history.j1)
+        await journal.append([history.r3])
+        await journal.close()
+        journal = files.journal()
+        assert await journal.open() == history.after_j2
+        await journal.close()
+
+    asyncio.run(main())
+
+
+def test_journal_of_a_single_torn_record(files, history):
+    files.write(files.journal_file, history.torn)
+    asyncio.run(recover(files, {}, records=0))
+
+
+# Compaction: rotate() moves the journal to .compacting and opens a new one,
+# compact() writes the snapshot through books.json.tmp and removes
+# .compacting. Recovery that finds .compacting appends the new journal to it
+# before compacting again. Each layout is (snapshot, .compacting, journal);
+# None leaves the file out.
+COMPACTION_STATES = {
+    "moved aside, no new journal": ("snapshot", "j1", None, "after_j1"),
+    "moved aside, empty new journal": ("snapshot", "j1", "", "after_j1"),
+    "moved aside, writes in new journal": ("snapshot", "j1", "j2", "after_j2"),
+    "snapshot written, .compacting not removed": ("after_j1", "j1", "j2", "after_j2"),
+    "torn record in .compacting": ("snapshot", "j1+torn", "j2", "after_j2"),
+    # A previous recovery died while appending the journal to .compacting.
+    "recovery merge torn": ("snapshot", "j1+j2[:-5]", "j2", "after_j2"),
+    "recovery merge written, journal not removed": (
+        "snapshot",
+        "j1+j2",
+        "j2",
+        "after_j2",
+    ),
+    "recovery merge done": ("snapshot", "j1+j2", None, "after_j2"),
+    "recovery snapshot written": ("after_j2", "j1+j2", None, "after_j2"),
+}
+
+
+def content(history: History, spec: str) -> bytes:
+    parts = {
+        "": b"",
+        "j1": history.j1,
+        "j2": history.j2,
+        "torn": history.torn,
+        "j2[:-5]": history.j2[:-5],
+    }
+    return b"".join(parts[part] for part in spec.split("+"))
+
+
+def snapshot_books(history: History, spec: str) -> list[Book]:
+    if spec == "snapshot":
+        return history.snapshot
+    return list(getattr(history, spec).values())
+
+
+@pytest.mark.parametrize("state", COMPACTION_STATES)
+def test_crash_during_compaction(files, history, state):
+    snapshot, compacting, journal, expected = COMPACTION_STATES[state]
+    asyncio.run(save_books(snapshot_books(history, snapshot), files.snapshot_file))
+    files.write(files.compacting_file, content(history, compacting))
+    if journal is not None:
+        files.write(files.journal_file, content(history, journal))
+    asyncio.run(recover(files, getattr(history, expected)))
+
+
+def test_torn_snapshot_write(files, history):
+    asyncio.run(save_books(history.snapshot, files.snapshot_file))
+    files.write(files.compacting_file, history.j1)
+    files.write(files.journal_file, history.j2)
+    files.write(f"{files.snapshot_file}.tmp", b'[{"id": "')
+    asyncio.run(recover(files, history.after_j2))
+
+
+def test_recovery_compacts_into_the_snapshot(files, history):
+    async def main():
+        await save_books(history.snapshot, files.snapshot_file)
+        files.write(files.compacting_file, history.j1)
+        files.write(files.journal_file, history.j2)
+        journal = files.journal()
+        await journal.open()
+        await journal.close()
+        books = await load_books(files.snapshot_file)
+        assert {book.id: book for book in books} == history.after_j2
+        assert os.path.getsize(files.journal_file) == 0
+
+    asyncio.run(main())
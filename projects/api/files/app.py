@@ -1,42 +1,349 @@
+import asyncio
+import logging
 import os
-import aiofiles
-from fastapi import FastAPI, File, UploadFile, Path, HTTPException
-from fastapi.responses import FileResponse
+import stat
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Path, HTTPException, Request, Response
 from pydantic import BaseModel, Field
+from .jobs import IngestionJob, IngestionQueue
+from .ranges import RangeFileResponse
+from .sessions import (
+    SESSION_ID_PATTERN,
+    SessionBusyError,
+    UploadSession,
+    UploadSessions,
+)
+from .storage import DIGEST_PATTERN, ContentStore
+from .streaming import UploadError, receive_file
 
 
 UPLOAD_DIRECTORY = "uploads"
-FILE_MAX_SIZE = 2 * 1024 * 1024  # Mb
+# Uploads in progress live on the same filesystem so they can be renamed in.
+INCOMING_DIRECTORY = os.path.join(UPLOAD_DIRECTORY, ".incoming")
+OBJECTS_DIRECTORY = os.path.join(UPLOAD_DIRECTORY, ".objects")
+SESSIONS_DIRECTORY = os.path.join(UPLOAD_DIRECTORY, ".sessions")
+FILE_MAX_SIZE = 512 * 1024 * 1024  # Mb
+# Room for the multipart boundaries and part headers around the file.
+MULTIPART_OVERHEAD = 64 * 1024
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+SESSION_SWEEP_INTERVAL = 60 * 60  # seconds
+
+logger = logging.getLogger(__name__)
 
 
-if not os.path.exists(UPLOAD_DIRECTORY):
-    os.makedirs(UPLOAD_DIRECTORY)
+if not os.path.exists(INCOMING_DIRECTORY):
+    os.makedirs(INCOMING_DIRECTORY)
 
 
 class SuccessMessage(BaseModel):
     message: str = Field(examples=["Операция успешно выполнена"])
 
 
-app = FastAPI()
+class StoredFile(SuccessMessage):
+    sha256: str
+    size: int
+    deduplicated: bool = Field(description="The content was already stored")
+
+
+class FileReference(BaseModel):
+    sha256: str = Field(pattern=DIGEST_PATTERN)
+
+
+class CreateUpload(BaseModel):
+    filename: str = Field(examples=["manual.pdf"])
+    size: int = Field(gt=0, le=FILE_MAX_SIZE)
+    chunk_size: int = Field(
+        default=DEFAULT_CHUNK_SIZE, ge=MIN_CHUNK_SIZE, le=MAX_CHUNK_SIZE
+    )
+
+
+class UploadStatus(BaseModel):
+    upload_id: str
+    filename: str
+    size: int
+    chunk_size: int
+    chunks: int
+    received: list[int]
+    missing: list[int]
+
+
+store = ContentStore(UPLOAD_DIRECTORY, OBJECTS_DIRECTORY)
+sessions = UploadSessions(SESSIONS_DIRECTORY)
+ingestion = IngestionQueue(store)
+
+
+async def expire_sessions():
+    while True:
+        try:
+            await asyncio.to_thread(sessions.expire)
+        except Exception:
+            # Try again at the next sweep rather than stop expiring sessions.
+            logger.exception("Expiring upload sessions failed")
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ingestion.open()
+    sweeper = asyncio.create_task(expire_sessions())
+    yield
+    sweeper.cancel()
+    await asyncio.gather(sweeper, return_exceptions=True)
+    await ingestion.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def upload_status(session: UploadSession) -> UploadStatus:
+    return UploadStatus(
+        upload_id=session.upload_id,
+        filename=session.filename,
+        size=session.size,
+        chunk_size=session.chunk_size,
+        chunks=session.chunks,
+        received=sorted(session.received),
+        missing=session.missing,
+    )
+
+
+def get_session(upload_id: str) -> UploadSession:
+    session = sessions.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Загрузка не найдена")
+    return session
+
+
+def check_new_filename(filename: str):
+    if os.path.exists(os.path.join(UPLOAD_DIRECTORY, filename)):
+        raise HTTPException(
+            status_code=400, detail="Файл с таким названием уже существует"
+        )
 
 
 @app.post(
     "/files",
     description="Upload file",
     response_description="File successfully uploaded",
-    response_model=SuccessMessage,
+    response_model=StoredFile,
     status_code=201,
+    # The body is parsed by hand, describe it for the docs.
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"],
+                    }
+                }
+            },
+        }
+    },
 )
-async def upload_file(file: UploadFile = File(...)):
-    if file.size > FILE_MAX_SIZE:
+async def upload_file(request: Request):
+    content_length = request.headers.get("content-length")
+    # Refuse an oversized body before reading any of it.
+    if (
+        content_length
+        and content_length.isdigit()
+        and int(content_length) > FILE_MAX_SIZE + MULTIPART_OVERHEAD
+    ):
         raise HTTPException(status_code=400, detail="Файл слишком большой")
-    file_path = os.path.join(UPLOAD_DIRECTORY, file.filename)
-    if os.path.exists(file_path):
+    try:
+        received = await receive_file(
+            request,
+            INCOMING_DIRECTORY,
+            FILE_MAX_SIZE,
+            check_filename=check_new_filename,
+        )
+    except UploadError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    file_path = os.path.join(UPLOAD_DIRECTORY, received.filename)
+    try:
+        # Names are hard links, which unlike a rename fail instead of replacing
+        # a file another request finished under the same name in the meantime.
+        created = await store.add(received.path, received.sha256, received.filename)
+    except FileExistsError:
+        raise HTTPException(
+            status_code=400, detail="Файл с таким названием уже существует"
+        )
+    finally:
+        os.remove(received.path)
+    await ingestion.submit(received.sha256, received.filename)
+    return StoredFile(
+        message=f"Файл сохранен и доступен по пути: {file_path}",
+        sha256=received.sha256,
+        size=received.size,
+        deduplicated=not created,
+    )
+
+
+@app.post(
+    "/uploads",
+    description="Start a resumable upload",
+    response_description="Upload session created",
+    response_model=UploadStatus,
+    status_code=201,
+)
+async def create_upload(upload: CreateUpload):
+    if not upload.filename or os.path.basename(upload.filename) != upload.filename:
+        raise HTTPException(status_code=400, detail="Некорректное название файла")
+    check_new_filename(upload.filename)
+    session = await sessions.create(upload.filename, upload.size, upload.chunk_size)
+    return upload_status(session)
+
+
+@app.put(
+    "/uploads/{upload_id}/chunks/{index}",
+    description="Upload one chunk, chunks may be sent in any order or in parallel",
+    response_description="Chunk stored",
+    response_model=UploadStatus,
+    status_code=200,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/octet-stream": {
+                    "schema": {"type": "string", "format": "binary"}
+                }
+            },
+        }
+    },
+)
+async def upload_chunk(
+    request: Request,
+    upload_id: str = Path(pattern=SESSION_ID_PATTERN),
+    index: int = Path(ge=0),
+):
+    session = get_session(upload_id)
+    try:
+        await sessions.write_chunk(session, index, request.stream())
+    except UploadError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    except SessionBusyError:
+        raise HTTPException(status_code=409, detail="Загрузка уже завершается")
+    except FileNotFoundError:
+        # The session was cancelled while the chunk was being written.
+        raise HTTPException(status_code=404, detail="Загрузка не найдена")
+    return upload_status(session)
+
+
+@app.get(
+    "/uploads/{upload_id}",
+    description="Get the chunks received so far",
+    response_description="Upload session state",
+    response_model=UploadStatus,
+    status_code=200,
+)
+async def get_upload(upload_id: str = Path(pattern=SESSION_ID_PATTERN)):
+    return upload_status(get_session(upload_id))
+
+
+@app.post(
+    "/uploads/{upload_id}/complete",
+    description="Finish a resumable upload once every chunk is received",
+    response_description="File successfully uploaded",
+    response_model=StoredFile,
+    status_code=201,
+)
+async def complete_upload(upload_id: str = Path(pattern=SESSION_ID_PATTERN)):
+    session = get_session(upload_id)
+    if session.missing:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Получены не все части", "missing": session.missing},
+        )
+    try:
+        digest = await sessions.complete(session)
+    except SessionBusyError:
+        raise HTTPException(status_code=409, detail="Части еще загружаются")
+    try:
+        created = await store.add(session.data_path, digest, session.filename)
+    except FileExistsError:
+        sessions.release(upload_id)
+        raise HTTPException(
+            status_code=400, detail="Файл с таким названием уже существует"
+        )
+    sessions.remove(upload_id)
+    await ingestion.submit(digest, session.filename)
+    file_path = os.path.join(UPLOAD_DIRECTORY, session.filename)
+    return StoredFile(
+        message=f"Файл сохранен и доступен по пути: {file_path}",
+        sha256=digest,
+        size=session.size,
+        deduplicated=not created,
+    )
+
+
+@app.delete(
+    "/uploads/{upload_id}",
+    description="Cancel a resumable upload",
+    response_description="Upload session deleted",
+    response_model=SuccessMessage,
+    status_code=200,
+)
+async def cancel_upload(upload_id: str = Path(pattern=SESSION_ID_PATTERN)):
+    get_session(upload_id)
+    try:
+        sessions.cancel(upload_id)
+    except SessionBusyError:
+        raise HTTPException(status_code=409, detail="Загрузка уже завершается")
+    return SuccessMessage(message="Загрузка отменена")
+
+
+@app.get(
+    "/ingestion/{sha256}",
+    description="Get the indexing status of a stored document",
+    response_description="Ingestion job state",
+    response_model=IngestionJob,
+    status_code=200,
+)
+async def get_ingestion(sha256: str = Path(pattern=DIGEST_PATTERN)):
+    job = ingestion.get(sha256)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
+
+
+@app.head(
+    "/objects/{sha256}",
+    description="Check whether content is already stored",
+    response_description="Content is stored, Content-Length is its size",
+    status_code=200,
+)
+async def check_object(sha256: str = Path(pattern=DIGEST_PATTERN)):
+    stat_result = store.stat_object(sha256)
+    if stat_result is None:
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    return Response(
+        headers={"content-length": str(stat_result.st_size), "etag": f'"{sha256}"'}
+    )
+
+
+@app.put(
+    "/files/{filename}",
+    description="Name already stored content without uploading it again",
+    response_description="File successfully created",
+    response_model=SuccessMessage,
+    status_code=201,
+)
+async def link_file(reference: FileReference, filename: str = Path()):
+    check_new_filename(filename)
+    try:
+        linked = await store.link(reference.sha256, filename)
+    except FileExistsError:
         raise HTTPException(
             status_code=400, detail="Файл с таким названием уже существует"
         )
-    async with aiofiles.open(file_path, "wb") as f:
-        await f.write(await file.read())
+    if not linked:
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    await ingestion.submit(reference.sha256, filename)
+    file_path = os.path.join(UPLOAD_DIRECTORY, filename)
     return SuccessMessage(message=f"Файл сохранен и доступен по пути: {file_path}")
 
 
@@ -44,11 +351,30 @@ async def upload_file(file: UploadFile = File(...)):
     "/files/{filename}",
     description="Download file",
     response_description="File successfully downloaded",
-    response_model=FileResponse,
+    response_class=RangeFileResponse,
     status_code=200,
 )
 async def download_file(filename: str = Path()):
     file_location = os.path.join(UPLOAD_DIRECTORY, filename)
-    if not os.path.exists(file_location):
+    try:
+        stat_result = os.stat(file_location)
+    except FileNotFoundError:
+        stat_result = None
+    if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    return RangeFileResponse(
+        path=file_location, filename=filename, stat_result=stat_result
+    )
+
+
+@app.delete(
+    "/files/{filename}",
+    description="Delete file",
+    response_description="File successfully deleted",
+    response_model=SuccessMessage,
+    status_code=200,
+)
+async def delete_file(filename: str = Path()):
+    if not await store.remove(filename):
         raise HTTPException(status_code=404, detail="Файл не найден")
-    return FileResponse(path=file_location, filename=filename)
+    return SuccessMessage(message="Файл успешно удален")
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from types import ModuleType
+from typing import Literal, Optional
+from langchain_core.embeddings import Embeddings
+from pydantic import BaseModel
+from .storage import ContentStore
+
+INGESTION_WORKERS = 2
+# Finished jobs kept for their status; older ones are evicted.
+FINISHED_JOBS = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def load_ingestion() -> Optional[ModuleType]:
+    """The document pipeline, or None when it can't be imported.
+
+    It lives in projects/document_processing, importable with the project root
+    on the path (``uvicorn projects.api.files.app:app`` from the root). The
+    files API serves files without it, only indexing is off.
+    """
+    try:
+        from projects.document_processing import ingestion
+    except ImportError as error:
+        logger.warning("Indexing of uploaded PDFs is disabled: %s", error)
+        return None
+    return ingestion
+
+
+class IngestionJob(BaseModel):
+    sha256: str
+    filename: Optional[str] = None
+    status: Literal["queued", "running", "done", "failed"] = "queued"
+    chunks: Optional[int] = None
+    # Chunks embedded for this version, the rest reused the previous version's.
+    embedded: Optional[int] = None
+    changed_pages: Optional[int] = None
+    previous: Optional[str] = None
+    error: Optional[str] = None
+
+
+class IngestionQueue:
+    """Background workers that index stored PDFs for question answering.
+
+    Jobs are keyed by content digest, so a document stored under several names
+    is indexed once, and an index already on disk is never rebuilt. A new
+    version stored under an indexed name only embeds the chunks that changed.
+    Loading, splitting and embedding run in worker threads, off the event loop.
+    The embedding model is loaded once, in the background, when the queue
+    opens. An index is removed when the store collects its document.
+    """
+
+    def __init__(
+        self,
+        store: ContentStore,
+        workers: int = INGESTION_WORKERS,
+        directory: Optional[str] = None,
+        embeddings: Optional[Embeddings] = None,
+    ):
+        self._store = store
+        self._workers = workers
+        self._directory = directory
+        self._embeddings = embeddings
+        self._ingestion: Optional[ModuleType] = None
+        self._warmup: Optional[asyncio.Future] = None
+        # Queued and running jobs, then the last finished ones, oldest first.
+        self._jobs: dict[str, IngestionJob] = {}
+        self._finished: OrderedDict[str, IngestionJob] = OrderedDict()
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+        store.on_collect.append(self.forget)
+
+    async def open(self):
+        self._ingestion = await asyncio.to_thread(load_ingestion)
+        if self._ingestion is None:
+            return
+        self._directory = self._directory or self._ingestion.INDEX_DIRECTORY
+        os.makedirs(self._directory, exist_ok=True)
+        # Workers share one model: loading it in each would take twice the
+        # time and memory.
+        if self._embeddings is None:
+            self._warmup = asyncio.ensure_future(
+                asyncio.to_thread(self._ingestion.get_embeddings)
+            )
+        # Pick up documents stored while no worker was running.
+        for digest in await asyncio.to_thread(self._store.list_objects):
+            if not os.path.exists(self._ingestion.index_path(digest, self._directory)):
+                await self.submit(digest)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self._workers)]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._warmup is not None:
+            await asyncio.gather(self._warmup, return_exceptions=True)
+            self._warmup = None
+
+    async def submit(
+        self, digest: str, filename: Optional[str] = None
+    ) -> Optional[IngestionJob]:
+        """Queue a stored document for indexing.
+
+        Returns None if it isn't a PDF or indexing is unavailable.
+        """
+        if self._ingestion is None:
+            return None
+        job = self.get(digest)
+        if job is not None and job.status != "failed":
+            return job
+        path = self._store.object_path(digest)
+        try:
+            if not await asyncio.to_thread(self._ingestion.is_pdf, path):
+                return None
+        except FileNotFoundError:
+            # Deleted right after it was stored.
+            return None
+        # Submitted again while the file was being read.
+        if digest in self._jobs:
+            return self._jobs[digest]
+        self._finished.pop(digest, None)
+        job = IngestionJob(sha256=digest, filename=filename)
+        self._jobs[digest] = job
+        self._queue.put_nowait(digest)
+        return job
+
+    def get(self, digest: str) -> Optional[IngestionJob]:
+        if self._ingestion is None:
+            return None
+        job = self._jobs.get(digest) or self._finished.get(digest)
+        if job is None and os.path.exists(
+            self._ingestion.index_path(digest, self._directory)
+        ):
+            job = IngestionJob(sha256=digest, status="done")
+        return job
+
+    def forget(self, digest: str):
+        """Drop the index and job of a document that is no longer stored."""
+        if self._ingestion is None:
+            return
+        self._ingestion.remove_index(digest, self._directory)
+        self._finished.pop(digest, None)
+
+    def _finish(self, job: IngestionJob):
+        del self._jobs[job.sha256]
+        self._finished[job.sha256] = job
+        while len(self._finished) > FINISHED_JOBS:
+            self._finished.popitem(last=False)
+
+    async def _work(self):
+        while True:
+            digest = await self._queue.get()
+            job = self._jobs[digest]
+            job.status = "running"
+            try:
+                if self._warmup is not None:
+                    self._embeddings = await self._warmup
+                stats = await asyncio.to_thread(
+                    self._ingestion.ingest,
+                    self._store.object_path(digest),
+                    digest,
+                    self._embeddings,
+                    self._directory,
+                    job.filename,
+                )
+                job.chunks = stats.chunks
+                job.embedded = stats.embedded
+                job.changed_pages = stats.changed_pages
+                job.previous = stats.previous
+                job.status = "done"
+                # Collected while it was being indexed.
+                if self._store.stat_object(digest) is None:
+                    self._ingestion.remove_index(digest, self._directory)
+            except Exception as error:
+                job.status = "failed"
+                job.error = str(error)
+            finally:
+                self._finish(job)
+                self._queue.task_done()
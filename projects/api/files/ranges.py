@@ -0,0 +1,177 @@
+import os
+import re
+from secrets import token_hex
+from typing import Optional
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 256 * 1024
+# More ranges than this are answered with the whole file, as RFC 9110 allows.
+MAX_RANGES = 32
+ZEROCOPY_SEND = "http.response.zerocopysend"
+
+RANGE_SPEC = re.compile(r"(\d*)-(\d*)", re.ASCII)
+
+
+class RangeNotSatisfiableError(Exception): ...
+
+
+def strong_etag(stat_result: os.stat_result) -> str:
+    # Changes whenever the file is replaced (inode) or rewritten (size, mtime).
+    return '"{:x}-{:x}-{:x}"'.format(
+        stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns
+    )
+
+
+def parse_range(header: str, size: int) -> Optional[list[tuple[int, int]]]:
+    """Parse a ``Range`` header into sorted, merged ``[start, end)`` ranges.
+
+    Returns None when the header should be ignored and the whole file sent.
+    """
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+    ranges = []
+    for spec in specs.split(","):
+        match = RANGE_SPEC.fullmatch(spec.strip())
+        if match is None:
+            return None
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = int(last) + 1 if last else size
+            if last and end <= start:
+                return None
+        elif last:
+            start, end = max(size - int(last), 0), size
+        else:
+            return None
+        # Ranges starting past the end are dropped; if none is left, it's a 416.
+        if start < min(end, size):
+            ranges.append((start, min(end, size)))
+    if not ranges:
+        raise RangeNotSatisfiableError()
+    if len(ranges) > MAX_RANGES:
+        return None
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class RangeFileResponse(FileResponse):
+    """FileResponse with byte ranges, strong ETags and zero-copy sending.
+
+    Handles ``Range``/``If-Range`` with single and ``multipart/byteranges``
+    206 responses. When the server offers the ASGI zero-copy send extension the
+    file is handed to it to ``sendfile``, otherwise it is read in chunks.
+    """
+
+    chunk_size = CHUNK_SIZE
+
+    def set_stat_headers(self, stat_result: os.stat_result):
+        self.headers.setdefault("etag", strong_etag(stat_result))
+        super().set_stat_headers(stat_result)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if self.stat_result is None:
+            self.stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            self.set_stat_headers(self.stat_result)
+        size = self.stat_result.st_size
+        headers = Headers(scope=scope)
+        ranges = None
+        if "range" in headers and self._if_range_matches(headers.get("if-range")):
+            try:
+                ranges = parse_range(headers["range"], size)
+            except RangeNotSatisfiableError:
+                response = Response(
+                    status_code=416, headers={"content-range": f"bytes */{size}"}
+                )
+                await response(scope, receive, send)
+                return
+
+        status_code = self.status_code
+        parts: list[tuple[bytes, int, int]] = [(b"", 0, size)]
+        trailer = b""
+        if ranges is not None and len(ranges) == 1:
+            status_code = 206
+            start, end = ranges[0]
+            parts = [(b"", start, end)]
+            self.headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+        elif ranges is not None:
+            status_code = 206
+            boundary = token_hex(13)
+            content_type = self.headers["content-type"]
+            parts = [
+                (
+                    (
+                        ("\r\n" if i else "")
+                        + f"--{boundary}\r\n"
+                        + f"Content-Type: {content_type}\r\n"
+                        + f"Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n"
+                    ).encode("latin-1"),
+                    start,
+                    end,
+                )
+                for i, (start, end) in enumerate(ranges)
+            ]
+            trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+        self.headers["content-length"] = str(
+            sum(len(head) + end - start for head, start, end in parts) + len(trailer)
+        )
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if scope["method"].upper() != "HEAD":
+            zerocopy = ZEROCOPY_SEND in scope.get("extensions", {})
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                for head, start, end in parts:
+                    if head:
+                        await self._send_body(send, head)
+                    if zerocopy:
+                        await send(
+                            {
+                                "type": ZEROCOPY_SEND,
+                                "file": file.wrapped,
+                                "offset": start,
+                                "count": end - start,
+                                "more_body": True,
+                            }
+                        )
+                        continue
+                    await file.seek(start)
+                    while start < end:
+                        chunk = await file.read(min(self.chunk_size, end - start))
+                        if not chunk:
+                            break
+                        start += len(chunk)
+                        await self._send_body(send, chunk)
+                if trailer:
+                    await self._send_body(send, trailer)
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
+
+    def _if_range_matches(self, if_range: Optional[str]) -> bool:
+        # Only resume if the client's copy is of this exact file version;
+        # otherwise the whole file is sent again.
+        if if_range is None:
+            return True
+        return if_range in (self.headers["etag"], self.headers["last-modified"])
+
+    @staticmethod
+    async def _send_body(send: Send, body: bytes):
+        await send({"type": "http.response.body", "body": body, "more_body": True})
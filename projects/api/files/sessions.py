@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+import aiofiles
+from .streaming import CHUNK_SIZE, UploadError, UploadTooLargeError
+
+SESSION_ID_PATTERN = "^[0-9a-f]{32}$"
+# Sessions without a chunk written for this long are removed with their
+# preallocated data file.
+SESSION_TTL = 24 * 60 * 60  # seconds
+
+
+class ChunkRangeError(UploadError): ...
+
+
+class SessionBusyError(Exception): ...
+
+
+@dataclass
+class UploadSession:
+    upload_id: str
+    filename: str
+    size: int
+    chunk_size: int
+    path: str
+    received: set[int] = field(default_factory=set)
+
+    @property
+    def data_path(self) -> str:
+        return os.path.join(self.path, "data")
+
+    @property
+    def chunks(self) -> int:
+        return -(-self.size // self.chunk_size)
+
+    @property
+    def missing(self) -> list[int]:
+        return [i for i in range(self.chunks) if i not in self.received]
+
+    def chunk_length(self, index: int) -> int:
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+
+class UploadSessions:
+    """Resumable uploads assembled in place on disk.
+
+    A session is a directory holding its metadata, a data file preallocated to
+    the final size and an empty marker per chunk written in full. Chunks are
+    written straight to their offset in the data file, so they may arrive in
+    any order or in parallel, and finishing the upload moves no data.
+    Abandoned sessions are removed by ``expire``.
+    """
+
+    def __init__(self, directory: str):
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # Chunks being written per session; a session can't complete meanwhile,
+        # and once it is completing no more chunks are accepted.
+        self._writers: Counter[str] = Counter()
+        self._completing: set[str] = set()
+
+    async def create(self, filename: str, size: int, chunk_size: int) -> UploadSession:
+        upload_id = uuid.uuid4().hex
+        session = UploadSession(
+            upload_id=upload_id,
+            filename=filename,
+            size=size,
+            chunk_size=chunk_size,
+            path=os.path.join(self._directory, upload_id),
+        )
+        try:
+            # Preallocating hundreds of megabytes takes a while, not on the loop.
+            await asyncio.to_thread(self._create_files, session)
+        except BaseException:
+            shutil.rmtree(session.path, ignore_errors=True)
+            raise
+        return session
+
+    def _create_files(self, session: UploadSession):
+        os.makedirs(os.path.join(session.path, "chunks"))
+        with open(session.data_path, "wb") as f:
+            # Reserve the blocks now so chunks can't fail halfway on a full disk.
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(f.fileno(), 0, session.size)
+            else:
+                f.truncate(session.size)
+        meta = {
+            "filename": session.filename,
+            "size": session.size,
+            "chunk_size": session.chunk_size,
+        }
+        with open(os.path.join(session.path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    def get(self, upload_id: str) -> Optional[UploadSession]:
+        path = os.path.join(self._directory, upload_id)
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            received = {int(name) for name in os.listdir(os.path.join(path, "chunks"))}
+        except FileNotFoundError:
+            return None
+        return UploadSession(upload_id=upload_id, path=path, received=received, **meta)
+
+    async def write_chunk(
+        self, session: UploadSession, index: int, body: AsyncIterator[bytes]
+    ):
+        if not 0 <= index < session.chunks:
+            raise ChunkRangeError("Неверный номер части")
+        if session.upload_id in self._completing:
+            raise SessionBusyError(session.upload_id)
+        expected = session.chunk_length(index)
+        marker = os.path.join(session.path, "chunks", str(index))
+        self._writers[session.upload_id] += 1
+        try:
+            # A chunk sent again is missing until all of it is rewritten, so a
+            # short or failed resend can't complete the upload with mixed data.
+            try:
+                os.remove(marker)
+            except FileNotFoundError:
+                pass
+            session.received.discard(index)
+            written = 0
+            buffer = bytearray()
+            async with aiofiles.open(session.data_path, "r+b") as f:
+                await f.seek(index * session.chunk_size)
+                async for data in body:
+                    written += len(data)
+                    if written > expected:
+                        raise UploadTooLargeError("Часть больше заявленного размера")
+                    buffer.extend(data)
+                    if len(buffer) >= CHUNK_SIZE:
+                        await f.write(buffer)
+                        buffer.clear()
+                await f.write(buffer)
+            if written != expected:
+                raise UploadError("Часть меньше заявленного размера")
+            # The marker goes last: a chunk only counts once all of it is written.
+            open(marker, "wb").close()
+            session.received.add(index)
+        finally:
+            self._writers[session.upload_id] -= 1
+            if not self._writers[session.upload_id]:
+                del self._writers[session.upload_id]
+
+    async def complete(self, session: UploadSession) -> str:
+        """Freeze the session and return the digest of its data.
+
+        The session stays frozen until it is removed or released.
+        """
+        upload_id = session.upload_id
+        if upload_id in self._writers or upload_id in self._completing:
+            raise SessionBusyError(upload_id)
+        self._completing.add(upload_id)
+        try:
+            return await asyncio.to_thread(file_digest, session.data_path)
+        except BaseException:
+            self.release(upload_id)
+            raise
+
+    def cancel(self, upload_id: str):
+        if upload_id in self._completing:
+            raise SessionBusyError(upload_id)
+        self.remove(upload_id)
+
+    def release(self, upload_id: str):
+        self._completing.discard(upload_id)
+
+    def remove(self, upload_id: str):
+        shutil.rmtree(os.path.join(self._directory, upload_id), ignore_errors=True)
+        self.release(upload_id)
+
+    def expire(self, ttl: float = SESSION_TTL) -> int:
+        """Remove sessions idle for ``ttl`` seconds; returns how many."""
+        deadline = time.time() - ttl
+        expired = 0
+        for upload_id in os.listdir(self._directory):
+            if upload_id in self._writers or upload_id in self._completing:
+                continue
+            path = os.path.join(self._directory, upload_id)
+            try:
+                last_active = self._last_active(path)
+            except FileNotFoundError:
+                # Completed or cancelled meanwhile.
+                continue
+            if last_active < deadline:
+                self.remove(upload_id)
+                expired += 1
+        return expired
+
+    @staticmethod
+    def _last_active(path: str) -> float:
+        try:
+            # A new chunk marker updates the chunks directory.
+            return os.stat(os.path.join(path, "chunks")).st_mtime
+        except FileNotFoundError:
+            # Left half-created by a crash.
+            return os.stat(path).st_mtime
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import stat
+from typing import Callable, Optional
+
+DIGEST_PATTERN = "^[0-9a-f]{64}$"
+
+
+class ContentStore:
+    """Uploaded files stored once per content, under their sha256 digest.
+
+    A filename is a hard link to its object, so names cost no extra space and
+    the object's link count is its reference count: the object itself plus
+    one per name. Removing the last name removes the object, and calls each of
+    ``on_collect`` with its digest.
+    """
+
+    def __init__(self, names_directory: str, objects_directory: str):
+        self._names = names_directory
+        self._objects = objects_directory
+        os.makedirs(objects_directory, exist_ok=True)
+        # Creating and dropping references must not interleave, or a name could
+        # be linked to an object that is being collected.
+        self._lock = asyncio.Lock()
+        self.on_collect: list[Callable[[str], None]] = []
+
+    def name_path(self, filename: str) -> str:
+        return os.path.join(self._names, filename)
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self._objects, digest)
+
+    def stat_object(self, digest: str) -> Optional[os.stat_result]:
+        try:
+            return os.stat(self.object_path(digest))
+        except FileNotFoundError:
+            return None
+
+    def list_objects(self) -> list[str]:
+        return os.listdir(self._objects)
+
+    async def add(self, path: str, digest: str, filename: str) -> bool:
+        """Store the file at ``path`` under ``filename``.
+
+        Returns False if the content was already stored and only a new name was
+        created. Raises FileExistsError if ``filename`` is taken. The file at
+        ``path`` is left for the caller to remove.
+        """
+        async with self._lock:
+            object_path = self.object_path(digest)
+            created = not os.path.exists(object_path)
+            if created:
+                mode = os.stat(path).st_mode
+                os.chmod(path, 0o444)
+                os.link(path, object_path)
+            try:
+                os.link(object_path, self.name_path(filename))
+            except FileExistsError:
+                if created:
+                    os.remove(object_path)
+                    # The caller may keep writing to the file, e.g. a resumed
+                    # upload session.
+                    os.chmod(path, mode)
+                raise
+            return created
+
+    async def link(self, digest: str, filename: str) -> bool:
+        """Add a name for stored content; returns False if it is not stored."""
+        async with self._lock:
+            try:
+                os.link(self.object_path(digest), self.name_path(filename))
+            except FileNotFoundError:
+                return False
+            return True
+
+    async def remove(self, filename: str) -> bool:
+        """Drop a name and collect its object if that was the last reference."""
+        async with self._lock:
+            path = self.name_path(filename)
+            try:
+                stat_result = os.stat(path)
+            except FileNotFoundError:
+                return False
+            if not stat.S_ISREG(stat_result.st_mode):
+                return False
+            os.remove(path)
+            # Files stored before deduplication have a single link and no object.
+            if stat_result.st_nlink == 2:
+                self._collect(stat_result.st_ino)
+            return True
+
+    def _collect(self, inode: int):
+        # Names do not record their digest; directory entries carry the inode,
+        # so finding the object costs no stat calls.
+        with os.scandir(self._objects) as entries:
+            digest = next(
+                (entry.name for entry in entries if entry.inode() == inode), None
+            )
+        if digest is None:
+            return
+        os.remove(self.object_path(digest))
+        for callback in self.on_collect:
+            callback(digest)
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Callable, Optional
+import aiofiles
+from fastapi import Request
+from python_multipart.multipart import (
+    MultipartParseError,
+    MultipartParser,
+    parse_options_header,
+)
+
+CHUNK_SIZE = 1024 * 1024  # bytes written to disk at a time
+
+
+class UploadError(Exception): ...
+
+
+class UploadTooLargeError(UploadError): ...
+
+
+@dataclass
+class ReceivedFile:
+    filename: str
+    path: str
+    size: int
+    sha256: str
+
+
+async def receive_file(
+    request: Request,
+    directory: str,
+    max_size: int,
+    field_name: str = "file",
+    check_filename: Optional[Callable[[str], None]] = None,
+) -> ReceivedFile:
+    """Stream the ``field_name`` part of a multipart body into a temp file.
+
+    The body is parsed as it arrives, so memory use does not depend on the
+    upload size, and the request is aborted as soon as the file part grows
+    past ``max_size``. The content is hashed on the way through. The caller
+    owns the returned temp file in ``directory``.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type"))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadError("Ожидается multipart/form-data")
+
+    # The parser reports parts through callbacks; they only queue events, the
+    # awaiting file writes happen between chunks of the body.
+    events: list[tuple[str, bytes | dict]] = []
+    header_field, header_value = bytearray(), bytearray()
+    headers: dict[bytes, bytes] = {}
+
+    def on_header_field(data: bytes, start: int, end: int):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data: bytes, start: int, end: int):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(headers.get(b"content-disposition"))
+        events.append(("part", disposition))
+        headers.clear()
+
+    def on_part_data(data: bytes, start: int, end: int):
+        events.append(("data", data[start:end]))
+
+    parser = MultipartParser(
+        boundary,
+        callbacks={
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+        },
+    )
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix="upload-", suffix=".part")
+    os.close(fd)
+    filename, size, in_file = None, 0, False
+    buffer = bytearray()
+    digest = hashlib.sha256()
+    try:
+        async with aiofiles.open(temp_path, "wb") as f:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                for kind, value in events:
+                    if kind == "part":
+                        in_file = (
+                            filename is None
+                            and value.get(b"name") == field_name.encode()
+                            and b"filename" in value
+                        )
+                        if in_file:
+                            # Never let the client pick a path outside the directory.
+                            filename = os.path.basename(value[b"filename"].decode())
+                            if not filename:
+                                raise UploadError("Не указано название файла")
+                            if check_filename is not None:
+                                check_filename(filename)
+                    elif in_file:
+                        size += len(value)
+                        if size > max_size:
+                            raise UploadTooLargeError("Файл слишком большой")
+                        buffer.extend(value)
+                        if len(buffer) >= CHUNK_SIZE:
+                            digest.update(buffer)
+                            await f.write(buffer)
+                            buffer.clear()
+                events.clear()
+            parser.finalize()
+            digest.update(buffer)
+            await f.write(buffer)
+        if filename is None:
+            raise UploadError("Файл не передан")
+    except MultipartParseError as error:
+        os.remove(temp_path)
+        raise UploadError("Некорректное тело запроса") from error
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return ReceivedFile(
+        filename=filename, path=temp_path, size=size, sha256=digest.hexdigest()
+    )
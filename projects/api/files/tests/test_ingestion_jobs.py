@@ -0,0 +1,74 @@
+import importlib
+import os
+import time
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+PDF = os.path.join(os.path.dirname(__file__), "../../../document_processing/resume.pdf")
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    module = importlib.reload(importlib.import_module("projects.api.files.app"))
+    module.ingestion._embeddings = DeterministicFakeEmbedding(size=8)
+    return module
+
+
+@pytest.fixture
+def client(app_module):
+    with TestClient(app_module.app) as client:
+        yield client
+
+
+@pytest.fixture
+def pdf() -> bytes:
+    with open(PDF, "rb") as f:
+        return f.read()
+
+
+def upload(client: TestClient, filename: str, content: bytes) -> str:
+    response = client.post("/files", files={"file": (filename, content)})
+    assert response.status_code == 201
+    return response.json()["sha256"]
+
+
+def wait_for_job(client: TestClient, digest: str) -> dict:
+    for _ in range(200):
+        job = client.get(f"/ingestion/{digest}").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(digest)
+
+
+def index_exists(digest: str) -> bool:
+    return os.path.exists(os.path.join("indexes", f"{digest}.json"))
+
+
+def test_deleting_the_last_name_removes_the_index(client, pdf):
+    digest = upload(client, "resume.pdf", pdf)
+    assert wait_for_job(client, digest)["status"] == "done"
+    upload(client, "copy.pdf", pdf)
+
+    client.delete("/files/resume.pdf")
+    assert index_exists(digest)
+    client.delete("/files/copy.pdf")
+    assert not index_exists(digest)
+    assert client.get(f"/ingestion/{digest}").status_code == 404
+
+
+def test_finished_jobs_are_evicted(app_module, client, pdf, monkeypatch):
+    monkeypatch.setattr(
+        importlib.import_module("projects.api.files.jobs"), "FINISHED_JOBS", 1
+    )
+    first = upload(client, "first.pdf", pdf)
+    assert wait_for_job(client, first)["chunks"] > 0
+    second = upload(client, "second.pdf", pdf + b"\n% second version\n")
+    assert wait_for_job(client, second)["chunks"] > 0
+
+    assert list(app_module.ingestion._finished) == [second]
+    # An evicted job is still reported done from its index.
+    job = client.get(f"/ingestion/{first}").json()
+    assert job["status"] == "done" and job["chunks"] is None
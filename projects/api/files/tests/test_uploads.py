@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import importlib
+import os
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from starlette.requests import ClientDisconnect
+
+CHUNK_SIZE = 256 * 1024  # the smallest the app accepts
+SIZE = 3 * CHUNK_SIZE + 1000
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    # The app keeps its files relative to the working directory and creates
+    # them on import.
+    monkeypatch.chdir(tmp_path)
+    module = importlib.reload(importlib.import_module("projects.api.files.app"))
+    # Keep the ingestion workers from loading the real model.
+    module.ingestion._embeddings = DeterministicFakeEmbedding(size=8)
+    return module
+
+
+@pytest.fixture
+def client(app_module):
+    with TestClient(app_module.app) as client:
+        yield client
+
+
+@pytest.fixture
+def content() -> bytes:
+    return os.urandom(SIZE)
+
+
+def chunk(content: bytes, index: int) -> bytes:
+    return content[index * CHUNK_SIZE : (index + 1) * CHUNK_SIZE]
+
+
+def start(client: TestClient, filename: str = "manual.bin") -> dict:
+    response = client.post(
+        "/uploads", json={"filename": filename, "size": SIZE, "chunk_size": CHUNK_SIZE}
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+def put_chunk(client: TestClient, upload_id: str, index: int, body: bytes):
+    return client.put(f"/uploads/{upload_id}/chunks/{index}", content=body)
+
+
+def assert_stored(client: TestClient, upload_id: str, content: bytes):
+    response = client.post(f"/uploads/{upload_id}/complete")
+    assert response.status_code == 201
+    assert response.json()["sha256"] == hashlib.sha256(content).hexdigest()
+    assert client.get("/files/manual.bin").content == content
+
+
+def test_chunks_out_of_order(client, content):
+    status = start(client)
+    assert status["chunks"] == 4
+    for index in (3, 1, 0, 2):
+        response = put_chunk(client, status["upload_id"], index, chunk(content, index))
+        assert response.status_code == 200
+    assert response.json()["missing"] == []
+    assert_stored(client, status["upload_id"], content)
+    assert client.get(f"/uploads/{status['upload_id']}").status_code == 404
+
+
+def test_resume_after_a_disconnect(app_module, client, content):
+    upload_id = start(client)["upload_id"]
+    put_chunk(client, upload_id, 0, chunk(content, 0))
+
+    async def dropped():
+        yield chunk(content, 1)[:1000]
+        raise ClientDisconnect()
+
+    session = app_module.sessions.get(upload_id)
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(app_module.sessions.write_chunk(session, 1, dropped()))
+
+    # The client asks what is missing and sends only that.
+    status = client.get(f"/uploads/{upload_id}").json()
+    assert status["received"] == [0]
+    assert status["missing"] == [1, 2, 3]
+    for index in status["missing"]:
+        assert put_chunk(client, upload_id, index, chunk(content, index)).is_success
+    assert_stored(client, upload_id, content)
+
+
+@pytest.mark.parametrize("length", [CHUNK_SIZE - 1, CHUNK_SIZE + 1])
+def test_wrong_size_chunk(client, content, length):
+    upload_id = start(client)["upload_id"]
+    response = put_chunk(client, upload_id, 0, os.urandom(length))
+    assert response.status_code == 400
+    assert client.get(f"/uploads/{upload_id}").json()["missing"] == [0, 1, 2, 3]
+    # The last chunk is shorter than the others.
+    assert put_chunk(client, upload_id, 3, chunk(content, 0)).status_code == 400
+    assert put_chunk(client, upload_id, 4, b"x").status_code == 400
+
+
+def test_duplicate_chunk(client, content):
+    upload_id = start(client)["upload_id"]
+    for index in range(4):
+        put_chunk(client, upload_id, index, chunk(content, index))
+    # Sent again in full: still received once, same content.
+    response = put_chunk(client, upload_id, 2, chunk(content, 2))
+    assert response.status_code == 200
+    assert response.json()["received"] == [0, 1, 2, 3]
+
+    # Sent again cut short: the chunk is missing until it is sent whole.
+    assert put_chunk(client, upload_id, 0, os.urandom(10)).status_code == 400
+    assert client.get(f"/uploads/{upload_id}").json()["missing"] == [0]
+    assert client.post(f"/uploads/{upload_id}/complete").status_code == 409
+    put_chunk(client, upload_id, 0, chunk(content, 0))
+    assert_stored(client, upload_id, content)
+
+
+def test_complete_with_a_missing_chunk(client, content):
+    upload_id = start(client)["upload_id"]
+    for index in (0, 1, 3):
+        put_chunk(client, upload_id, index, chunk(content, index))
+    response = client.post(f"/uploads/{upload_id}/complete")
+    assert response.status_code == 409
+    assert response.json()["detail"]["missing"] == [2]
+    assert not os.path.exists(os.path.join("uploads", "manual.bin"))
+
+    put_chunk(client, upload_id, 2, chunk(content, 2))
+    assert_stored(client, upload_id, content)
+
+
+def test_expire_skips_sessions_removed_meanwhile(app_module, client, monkeypatch):
+    kept, removed = start(client)["upload_id"], start(client)["upload_id"]
+    sessions = app_module.sessions
+    last_active = sessions._last_active
+
+    def remove_first(path: str) -> float:
+        # The other session completes between listdir and stat.
+        sessions.remove(removed)
+        return last_active(path)
+
+    monkeypatch.setattr(sessions, "_last_active", remove_first)
+    assert sessions.expire(ttl=-1) == 1
+    assert sessions.get(kept) is None and sessions.get(removed) is None
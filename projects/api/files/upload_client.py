@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import httpx
+
+# Resumable upload of a large file to the files API:
+#   python projects/api/files/upload_client.py manual.pdf --parallel 4
+# After an interruption, run it again with --resume <upload_id> to send only the
+# missing chunks.
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_chunk(path: str, offset: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+async def upload(args: argparse.Namespace):
+    filename = args.name or os.path.basename(args.path)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+        digest = file_digest(args.path)
+        response = await client.head(f"/objects/{digest}")
+        if response.status_code == 200:
+            # The server has this content already, only the name is created.
+            response = await client.put(f"/files/{filename}", json={"sha256": digest})
+            print(response.status_code, response.json())
+            return
+
+        if args.resume:
+            response = await client.get(f"/uploads/{args.resume}")
+        else:
+            response = await client.post(
+                "/uploads",
+                json={
+                    "filename": filename,
+                    "size": os.path.getsize(args.path),
+                    "chunk_size": args.chunk_size,
+                },
+            )
+        response.raise_for_status()
+        status = response.json()
+        upload_id, chunk_size = status["upload_id"], status["chunk_size"]
+        print(f"upload {upload_id}: {len(status['missing'])} chunks to send")
+
+        pending = iter(status["missing"])
+
+        async def worker():
+            for index in pending:
+                body = await asyncio.to_thread(
+                    read_chunk, args.path, index * chunk_size, chunk_size
+                )
+                for attempt in range(args.retries):
+                    try:
+                        response = await client.put(
+                            f"/uploads/{upload_id}/chunks/{index}", content=body
+                        )
+                        response.raise_for_status()
+                        break
+                    except httpx.HTTPError as error:
+                        print(f"chunk {index} attempt {attempt + 1} failed: {error}")
+                else:
+                    raise RuntimeError(
+                        f"chunk {index} failed, resume with --resume {upload_id}"
+                    )
+
+        await asyncio.gather(*(worker() for _ in range(args.parallel)))
+        response = await client.post(f"/uploads/{upload_id}/complete")
+        print(response.status_code, response.json())
+        if response.status_code == 201 and response.json()["sha256"] != digest:
+            raise RuntimeError("Stored file digest does not match the local file")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable chunked file upload")
+    parser.add_argument("path")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--name", help="filename on the server")
+    parser.add_argument("--chunk-size", type=int, default=8 * 1024 * 1024)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--resume", metavar="UPLOAD_ID")
+    asyncio.run(upload(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
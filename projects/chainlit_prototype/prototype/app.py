@@ -1,16 +1,34 @@
+import asyncio
 import os
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from typing import List
-from langchain_community.document_loaders import PyPDFLoader
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.runnables import Runnable, RunnableParallel
 from langchain_core.output_parsers import StrOutputParser
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.vectorstores import InMemoryVectorStore
 from langchain.docstore.document import Document
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
 import chainlit as cl
+from chainlit.logger import logger
+from projects.document_processing.embedding_cache import CachedEmbeddings
+from projects.document_processing.incremental import SourceVersion, hash_pages
+from projects.document_processing.ingestion import (
+    TOKEN_BATCHING,
+    file_digest,
+    get_model,
+    load_index,
+    load_version,
+    make_deduplicator,
+    make_splitter,
+    remove_index,
+    reuse_embeddings,
+    save_index,
+    save_version,
+    with_source,
+)
+from projects.document_processing.microbatching import MicroBatchingEmbeddings
+from projects.document_processing.parallel_loader import ParallelPyPDFLoader
+from projects.document_processing.pipeline import aindex_documents
 
 load_dotenv()
 
@@ -36,7 +54,31 @@ llm = ChatOpenAI(
     # max_tokens=5000,
 )
 
-embeddings = HuggingFaceEmbeddings(model_name="intfloat/multilingual-e5-large-instruct")
+# Questions and uploads of all chats are embedded together: requests that
+# arrive within a few milliseconds share one forward pass.
+embedding_service = MicroBatchingEmbeddings.from_huggingface(
+    get_model(), TOKEN_BATCHING
+)
+embeddings = CachedEmbeddings(embedding_service)
+
+
+def report_indexing_failure(filename: str):
+    def report(indexing: asyncio.Task):
+        if indexing.cancelled() or indexing.exception() is None:
+            return
+        logger.error("Indexing %s failed", filename, exc_info=indexing.exception())
+        # Questions keep being answered, from the chunks indexed so far.
+        asyncio.create_task(
+            cl.Message(
+                content=(
+                    f"Не удалось проиндексировать файл {filename} до конца: "
+                    f"{indexing.exception()!r}. Ответы будут даны только по "
+                    f"уже проиндексированной части"
+                )
+            ).send()
+        )
+
+    return report
 
 
 @cl.on_chat_start
@@ -59,18 +101,67 @@ async def on_chat_start():
     msg = cl.Message(content=f"Обрабатывается файл {file.name}...")
     await msg.send()
 
-    loader = PyPDFLoader(file.path)
-    chunks = loader.load_and_split(
-        RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=100)
-    )
-
-    msg.content = f"Файл {file.name} разбит на {len(chunks)} чанков"
-    await msg.update()
-
-    vectorstore = InMemoryVectorStore.from_documents(chunks, embeddings)
-
-    msg.content = f"Векторное хранилище построено на основе чанков из файла {file.name}"
-    await msg.update()
+    # Documents uploaded through the files API are indexed in the background,
+    # reuse that index instead of embedding the file again.
+    digest = await cl.make_async(file_digest)(file.path)
+    vectorstore = await cl.make_async(load_index)(digest, embeddings)
+
+    if vectorstore is None:
+        # A new revision of a file indexed before only embeds the changed chunks.
+        previous = await cl.make_async(load_version)(file.name)
+        reused = await cl.make_async(reuse_embeddings)(embeddings, previous)
+        vectorstore = InMemoryVectorStore(reused)
+        pages = []
+        progress = cl.Message(content=f"Индексируется файл {file.name}...")
+        await progress.send()
+        first_batch = asyncio.Event()
+
+        async def on_progress(total: int):
+            first_batch.set()
+            progress.content = f"Из файла {file.name} проиндексировано {total} чанков"
+            await progress.update()
+
+        async def index_file():
+            documents = with_source(
+                ParallelPyPDFLoader(file.path).lazy_load(), file.name
+            )
+            total = await aindex_documents(
+                hash_pages(documents, pages),
+                vectorstore,
+                make_splitter(),
+                deduplicator=make_deduplicator(),
+                on_progress=on_progress,
+            )
+            await cl.make_async(save_index)(vectorstore, digest)
+            await cl.make_async(save_version)(SourceVersion(file.name, digest, pages))
+            # The new version replaces the old one, whose index nothing loads now.
+            if previous is not None and previous.sha256 != digest:
+                await cl.make_async(remove_index)(previous.sha256)
+            progress.content = (
+                f"Векторное хранилище построено на основе {total} чанков "
+                f"из файла {file.name}"
+            )
+            if previous is not None:
+                progress.content += (
+                    f", по сравнению с прошлой версией изменилось "
+                    f"{previous.changed_pages(pages)} страниц и {reused.embedded} чанков"
+                )
+            await progress.update()
+
+        # Chunks are searchable batch by batch: answer questions as soon as
+        # the first batch is in while the rest of the file is indexed.
+        indexing = asyncio.create_task(index_file())
+        cl.user_session.set("indexing", indexing)
+        waiter = asyncio.create_task(first_batch.wait())
+        await asyncio.wait([indexing, waiter], return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+        if indexing.done():
+            indexing.result()
+        else:
+            indexing.add_done_callback(report_indexing_failure(file.name))
+    else:
+        msg.content = f"Файл {file.name} уже проиндексирован"
+        await msg.update()
 
     retriever = vectorstore.as_retriever()
     chain = RunnableParallel(
@@ -100,3 +191,12 @@ async def main(message: cl.Message):
         for index, chunk in enumerate(chunks)
     ]
     await cl.Message(content=answer, elements=text_elements).send()
+    logger.debug("Embedding service: %s", embedding_service.metrics())
+
+
+@cl.on_chat_end
+async def on_chat_end():
+    # Stop indexing a file nobody will ask about anymore.
+    indexing: asyncio.Task = cl.user_session.get("indexing")
+    if indexing is not None:
+        indexing.cancel()
@@ -0,0 +1,225 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Iterator, Optional, Union
+import aiohttp
+from bs4 import BeautifulSoup
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+WEB_CACHE_DIRECTORY = os.getenv("WEB_CACHE_DIRECTORY", ".web_cache")
+CONNECTION_LIMIT = 64
+CONNECTION_LIMIT_PER_HOST = 8
+REQUEST_TIMEOUT = 30  # seconds
+RETRIES = 3
+BACKOFF = 1.0  # seconds, doubled after every failed attempt
+USER_AGENT = os.getenv("USER_AGENT", "DocuMind/0.1")
+
+
+def build_metadata(soup: Any, url: str) -> dict:
+    # Same metadata as WebBaseLoader: source, title, description and language.
+    metadata = {"source": url}
+    if title := soup.find("title"):
+        metadata["title"] = title.get_text()
+    if description := soup.find("meta", attrs={"name": "description"}):
+        metadata["description"] = description.get("content", "No description found.")
+    if html := soup.find("html"):
+        metadata["language"] = html.get("lang", "No language found.")
+    return metadata
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    charset: Optional[str] = None
+
+
+class HttpCache:
+    """Responses on disk with the validators needed to revalidate them.
+
+    Each URL has a ``.json`` file with its ETag and Last-Modified and a
+    ``.body`` file with the content. Both are replaced atomically, the body
+    first, so an entry never points to a partial body.
+    """
+
+    def __init__(self, directory: str = WEB_CACHE_DIRECTORY):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(
+            self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest()
+        )
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        try:
+            with open(f"{self._path(url)}.json", encoding="utf-8") as f:
+                entry = CacheEntry(**json.load(f))
+        except FileNotFoundError:
+            return None
+        return entry if entry.url == url else None
+
+    def read(self, url: str) -> bytes:
+        with open(f"{self._path(url)}.body", "rb") as f:
+            return f.read()
+
+    def put(self, entry: CacheEntry, body: bytes):
+        path = self._path(entry.url)
+        for suffix, data in [
+            (".body", body),
+            (".json", json.dumps(asdict(entry)).encode("utf-8")),
+        ]:
+            temp_path = f"{path}{suffix}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, f"{path}{suffix}")
+
+
+class AsyncWebLoader(BaseLoader):
+    """Load many web pages concurrently, revalidating a local HTTP cache.
+
+    A drop-in for ``WebBaseLoader(web_paths, bs_kwargs=...)``: pages are
+    parsed with the same ``bs_kwargs`` (e.g. a ``SoupStrainer``) and give the
+    same text and metadata. Requests share one keep-alive connection pool
+    with a per-host limit. Responses carrying an ETag or Last-Modified are
+    cached on disk and requested again conditionally, so unchanged pages come
+    back as empty 304 responses. Documents are yielded in ``web_paths`` order.
+
+    Unlike WebBaseLoader, error responses raise instead of being parsed; with
+    ``continue_on_failure`` the page is skipped and counted in ``stats``.
+    """
+
+    def __init__(
+        self,
+        web_paths: Union[str, list[str]],
+        bs_kwargs: Optional[dict] = None,
+        bs_get_text_kwargs: Optional[dict] = None,
+        default_parser: str = "html.parser",
+        cache_directory: Optional[str] = WEB_CACHE_DIRECTORY,
+        limit: int = CONNECTION_LIMIT,
+        limit_per_host: int = CONNECTION_LIMIT_PER_HOST,
+        timeout: float = REQUEST_TIMEOUT,
+        retries: int = RETRIES,
+        headers: Optional[dict] = None,
+        continue_on_failure: bool = False,
+    ):
+        if isinstance(web_paths, str):
+            web_paths = [web_paths]
+        self.web_paths = list(web_paths)
+        self.bs_kwargs = bs_kwargs or {}
+        self.bs_get_text_kwargs = bs_get_text_kwargs or {}
+        self.default_parser = default_parser
+        self.cache = None if cache_directory is None else HttpCache(cache_directory)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.headers = {"User-Agent": USER_AGENT} | (headers or {})
+        self.continue_on_failure = continue_on_failure
+        # Responses of the last load by kind: fetched, not_modified, failed.
+        self.stats: Counter[str] = Counter()
+
+    async def _get(
+        self, session: aiohttp.ClientSession, url: str
+    ) -> tuple[bytes, Optional[str]]:
+        entry = None if self.cache is None else self.cache.get(url)
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        for attempt in range(self.retries):
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304 and entry is not None:
+                        self.stats["not_modified"] += 1
+                        return self.cache.read(url), entry.charset
+                    response.raise_for_status()
+                    body = await response.read()
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+                    if self.cache is not None and (etag or last_modified):
+                        self.cache.put(
+                            CacheEntry(url, etag, last_modified, response.charset),
+                            body,
+                        )
+                    self.stats["fetched"] += 1
+                    return body, response.charset
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+                if attempt == self.retries - 1:
+                    raise
+                logger.warning(
+                    f"Error fetching {url} with attempt "
+                    f"{attempt + 1}/{self.retries}: {error!r}. Retrying..."
+                )
+                await asyncio.sleep(BACKOFF * 2**attempt)
+        raise ValueError("retry count exceeded")
+
+    def _parse(self, url: str, body: bytes, charset: Optional[str]) -> Document:
+        parser = "xml" if url.endswith(".xml") else self.default_parser
+        soup = BeautifulSoup(body, parser, from_encoding=charset, **self.bs_kwargs)
+        return Document(
+            page_content=soup.get_text(**self.bs_get_text_kwargs),
+            metadata=build_metadata(soup, url),
+        )
+
+    async def _load(
+        self, session: aiohttp.ClientSession, url: str
+    ) -> Optional[Document]:
+        try:
+            body, charset = await self._get(session, url)
+            # Parsing is CPU-bound, keep the event loop serving other downloads.
+            return await asyncio.to_thread(self._parse, url, body, charset)
+        except Exception as error:
+            if not self.continue_on_failure:
+                raise
+            self.stats["failed"] += 1
+            logger.warning(f"Error loading {url}: {error!r}, skipping")
+            return None
+
+    async def alazy_load(self) -> AsyncIterator[Document]:
+        self.stats.clear()
+        connector = aiohttp.TCPConnector(
+            limit=self.limit, limit_per_host=self.limit_per_host
+        )
+        async with aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        ) as session:
+            # Enough pages in flight to keep every connection busy, without
+            # holding thousands of parsed pages ahead of a slow consumer.
+            pending: deque[asyncio.Task] = deque()
+            urls = iter(self.web_paths)
+            try:
+                for url in urls:
+                    pending.append(asyncio.create_task(self._load(session, url)))
+                    if len(pending) >= 2 * self.limit:
+                        break
+                while pending:
+                    document = await pending.popleft()
+                    url = next(urls, None)
+                    if url is not None:
+                        pending.append(asyncio.create_task(self._load(session, url)))
+                    if document is not None:
+                        yield document
+            finally:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def lazy_load(self) -> Iterator[Document]:
+        # Pages are fetched concurrently, so the sync API loads them all first,
+        # on an event loop of its own: the caller may be running one already
+        # (chainlit, FastAPI), and asyncio.run refuses to nest.
+        with ThreadPoolExecutor(1, thread_name_prefix="web-loader") as executor:
+            yield from executor.submit(asyncio.run, self.aload()).result()
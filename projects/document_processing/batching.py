@@ -0,0 +1,130 @@
+import asyncio
+from typing import Callable, Iterator, Optional
+from langchain_core.embeddings import Embeddings
+
+# Padded tokens per forward pass: 32 chunks of 256 tokens, or 128 of 64.
+TOKEN_BUDGET = 8192
+MAX_BATCH_SIZE = 256
+
+
+def token_batches(
+    lengths: list[int], token_budget: int, max_batch_size: int = MAX_BATCH_SIZE
+) -> Iterator[list[int]]:
+    """Group text indexes into batches of similar length under a token budget.
+
+    Texts are taken longest first, so every batch is padded to the length of
+    its first text; a batch is full when one more text would take its padded
+    size (texts times that length) over ``token_budget``. A text longer than
+    the budget gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__, reverse=True)
+    batch: list[int] = []
+    for index in order:
+        if batch and (
+            (len(batch) + 1) * lengths[batch[0]] > token_budget
+            or len(batch) == max_batch_size
+        ):
+            yield batch
+            batch = []
+        batch.append(index)
+    if batch:
+        yield batch
+
+
+def sentence_transformer(embeddings: Embeddings):
+    """The sentence-transformers model behind ``HuggingFaceEmbeddings``.
+
+    langchain-huggingface keeps it in ``_client`` (``client`` before 0.1).
+    Anything without the expected model, or with a process pool, is refused
+    instead of being guessed at.
+    """
+    model = getattr(embeddings, "_client", None) or getattr(embeddings, "client", None)
+    if not all(
+        hasattr(model, name) for name in ("encode", "tokenizer", "max_seq_length")
+    ):
+        raise TypeError(
+            f"{type(embeddings).__name__} has no sentence-transformers model"
+        )
+    if getattr(embeddings, "multi_process", False):
+        raise TypeError("multi-process HuggingFaceEmbeddings are not supported")
+    return model
+
+
+def encode(
+    embeddings: Embeddings, texts: list[str], encode_kwargs: dict
+) -> list[list[float]]:
+    """Embed ``texts`` in one forward pass, as ``HuggingFaceEmbeddings`` does.
+
+    sentence-transformers would otherwise cut them again into its fixed
+    batch_size.
+    """
+    texts = [text.replace("\n", " ") for text in texts]
+    vectors = sentence_transformer(embeddings).encode(
+        texts,
+        **{"show_progress_bar": False} | encode_kwargs | {"batch_size": len(texts)},
+    )
+    return vectors.tolist()
+
+
+class TokenBudgetEmbeddings(Embeddings):
+    """Embed documents in batches of similar token length.
+
+    A batch is padded to its longest text, so a fixed number of texts of
+    mixed lengths spends most of a forward pass on padding. Here texts are
+    sorted by token count and cut into batches under a budget of padded
+    tokens: many short texts go together, long ones in small batches. Vectors
+    come back in the order of the texts. Queries are passed through.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        count_tokens: Callable[[list[str]], list[int]],
+        embed_batch: Optional[Callable[[list[str]], list[list[float]]]] = None,
+        token_budget: int = TOKEN_BUDGET,
+        max_batch_size: int = MAX_BATCH_SIZE,
+    ):
+        self.embeddings = embeddings
+        self.count_tokens = count_tokens
+        self.embed_batch = embed_batch or embeddings.embed_documents
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+
+    @classmethod
+    def from_huggingface(
+        cls, embeddings: Embeddings, token_budget: int = TOKEN_BUDGET, **kwargs
+    ) -> "TokenBudgetEmbeddings":
+        """Wrap ``HuggingFaceEmbeddings``, counting tokens with its tokenizer."""
+        model = sentence_transformer(embeddings)
+
+        def count_tokens(texts: list[str]) -> list[int]:
+            encoded = model.tokenizer(
+                texts, truncation=True, max_length=model.max_seq_length
+            )
+            return [len(ids) for ids in encoded["input_ids"]]
+
+        def embed_batch(texts: list[str]) -> list[list[float]]:
+            return encode(embeddings, texts, embeddings.encode_kwargs)
+
+        return cls(embeddings, count_tokens, embed_batch, token_budget, **kwargs)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors: list[Optional[list[float]]] = [None] * len(texts)
+        if not texts:
+            return []
+        lengths = self.count_tokens(texts)
+        for batch in token_batches(lengths, self.token_budget, self.max_batch_size):
+            for index, vector in zip(
+                batch, self.embed_batch([texts[index] for index in batch])
+            ):
+                vectors[index] = vector
+        return vectors
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.embeddings.aembed_query(text)
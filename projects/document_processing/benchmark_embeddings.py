@@ -0,0 +1,47 @@
+import argparse
+import time
+import numpy as np
+from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+from projects.document_processing.batching import TokenBudgetEmbeddings
+from projects.document_processing.benchmark_loader import SAMPLE_PDF
+from projects.document_processing.ingestion import EMBEDDING_MODEL, make_splitter
+from projects.document_processing.parallel_loader import ParallelPyPDFLoader
+
+# Run from the project root:
+#   python -m projects.document_processing.benchmark_embeddings --pdf manual.pdf
+# Embeds the chunks of a PDF with the fixed batches of sentence-transformers,
+# then with token-budget batches, and checks that the vectors match. The
+# default resume.pdf is small, pass a long document for meaningful timings.
+
+
+def timed(embed, texts: list[str]) -> tuple[float, np.ndarray]:
+    start = time.perf_counter()
+    vectors = embed(texts)
+    return time.perf_counter() - start, np.array(vectors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding batching")
+    parser.add_argument("--pdf", default=SAMPLE_PDF)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--limit", type=int, default=1000, help="chunks to embed")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[4096, 8192, 16384])
+    args = parser.parse_args()
+
+    chunks = make_splitter().split_documents(ParallelPyPDFLoader(args.pdf).load())
+    texts = [chunk.page_content for chunk in chunks][: args.limit]
+    embeddings = HuggingFaceEmbeddings(model_name=args.model)
+    embeddings.embed_documents(texts[:8])  # warm up
+
+    baseline, expected = timed(embeddings.embed_documents, texts)
+    print(f"fixed batches: {len(texts)} chunks in {baseline:.1f} s")
+    for budget in args.budgets:
+        bucketed = TokenBudgetEmbeddings.from_huggingface(embeddings, budget)
+        elapsed, vectors = timed(bucketed.embed_documents, texts)
+        # Padding changes the arithmetic slightly, not the vectors.
+        assert np.allclose(vectors, expected, atol=1e-4), "vectors differ"
+        print(f"token budget {budget}: {elapsed:.1f} s ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import argparse
+import os
+import tempfile
+import time
+import pypdf
+from langchain_community.document_loaders import PyPDFLoader
+from projects.document_processing.parallel_loader import ParallelPyPDFLoader
+
+# Run from the project root:
+#   python -m projects.document_processing.benchmark_loader --copies 1000
+# Without --pdf, resume.pdf is repeated --copies times to get a long document.
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), "resume.pdf")
+
+
+def make_long_pdf(source: str, copies: int, path: str):
+    writer = pypdf.PdfWriter()
+    for _ in range(copies):
+        writer.append(source)
+    writer.write(path)
+
+
+def timed(load) -> tuple[float, list]:
+    start = time.perf_counter()
+    documents = load()
+    return time.perf_counter() - start, documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PDF loaders")
+    parser.add_argument("--pdf", help="PDF to load instead of a generated one")
+    parser.add_argument("--copies", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.pdf
+        if path is None:
+            path = os.path.join(directory, "long.pdf")
+            make_long_pdf(SAMPLE_PDF, args.copies, path)
+        baseline, expected = timed(PyPDFLoader(path).load)
+        print(f"PyPDFLoader: {len(expected)} pages in {baseline:.2f} s")
+        for workers in args.workers:
+            elapsed, documents = timed(
+                ParallelPyPDFLoader(path, max_workers=workers).load
+            )
+            assert documents == expected, "parallel loader output differs"
+            print(
+                f"ParallelPyPDFLoader, {workers} workers: {elapsed:.2f} s "
+                f"({baseline / elapsed:.1f}x)"
+            )
+
+
+# Worker processes may import this module again, don't rerun the benchmark.
+if __name__ == "__main__":
+    main()
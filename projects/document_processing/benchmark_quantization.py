@@ -0,0 +1,96 @@
+import argparse
+import tempfile
+import time
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from projects.document_processing.quantization import QuantizedVectorStore
+from projects.document_processing.scoring import normalize, top_k
+
+# Run from the project root:
+#   python -m projects.document_processing.benchmark_quantization --size 200000
+# Compares search over float32 vectors with int8 and binary codes rescored
+# from disk: memory, time per query and recall of the float top k. Without
+# --vectors, the vectors are generated like sentence embeddings: clustered
+# around topics and sharing a common direction, so that all cosine
+# similarities are high and close together.
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """Documents are the indexes of rows of ``vectors``, as text."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.vectors[[int(text) for text in texts]].tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.vectors[int(text)].tolist()
+
+
+def generate(
+    size: int, dimensions: int, topics: int, rng: np.random.Generator
+) -> np.ndarray:
+    common = rng.normal(size=dimensions) * 3
+    centers = rng.normal(size=(topics, dimensions)) + common
+    vectors = centers[rng.integers(topics, size=size)]
+    vectors += rng.normal(size=(size, dimensions)).astype(np.float32) * 1.5
+    return normalize(vectors.astype(np.float32))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized search")
+    parser.add_argument("--vectors", help=".npy file of document vectors")
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dimensions", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.vectors:
+        vectors = normalize(np.load(args.vectors).astype(np.float32))
+    else:
+        vectors = generate(args.size, args.dimensions, args.size // 100 + 1, rng)
+    # Queries close to documents, like a question to its answer.
+    queries = vectors[rng.integers(len(vectors), size=args.queries)]
+    queries = normalize(queries + rng.normal(size=queries.shape) * 0.03)
+
+    start = time.perf_counter()
+    expected = [top_k(vectors @ query, args.k) for query in queries]
+    elapsed = (time.perf_counter() - start) / len(queries)
+    print(
+        f"float32: {vectors.nbytes / 2**20:.0f} MiB, "
+        f"{elapsed * 1000:.1f} ms per query"
+    )
+
+    embeddings = PrecomputedEmbeddings(vectors)
+    documents = [Document(page_content=str(index)) for index in range(len(vectors))]
+    for mode in ("int8", "binary"):
+        with tempfile.TemporaryDirectory() as directory:
+            store = QuantizedVectorStore(embeddings, directory, mode)
+            for start in range(0, len(documents), 10_000):
+                store.add_documents(documents[start : start + 10_000])
+            start = time.perf_counter()
+            found = [
+                store.similarity_search_by_vector(query, args.k) for query in queries
+            ]
+            elapsed = (time.perf_counter() - start) / len(queries)
+            recall = np.mean(
+                [
+                    len({int(d.page_content) for d in result} & set(indexes.tolist()))
+                    / args.k
+                    for result, indexes in zip(found, expected)
+                ]
+            )
+            print(
+                f"{mode}: {store.nbytes / 2**20:.0f} MiB, "
+                f"{elapsed * 1000:.1f} ms per query, "
+                f"recall@{args.k} {recall:.3f} "
+                f"(store.recall: {store.recall(queries[:20], args.k):.3f})"
+            )
+
+
+if __name__ == "__main__":
+    main()
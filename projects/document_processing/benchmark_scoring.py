@@ -0,0 +1,77 @@
+import argparse
+import time
+import numpy as np
+from projects.document_processing.scoring import SimilarityIndex, paired_scores
+
+# Run from the project root:
+#   python -m projects.document_processing.benchmark_scoring --documents 10000
+# Scores every query against every document with the per-pair
+# similarity_score the embeddings examples used, then with one matrix
+# product, and checks that the scores match.
+
+
+def similarity_score(vector1: np.array, vector2: np.array) -> float:
+    return np.sum(vector1 * vector2) / (
+        np.linalg.norm(vector1) * np.linalg.norm(vector2)
+    )
+
+
+def timed(function, *args) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark similarity scoring")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--documents", type=int, default=10_000)
+    parser.add_argument("--dimensions", type=int, default=1024)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.normal(size=(args.queries, args.dimensions)).astype(np.float32)
+    documents = rng.normal(size=(args.documents, args.dimensions)).astype(np.float32)
+    pairs = args.queries * args.documents
+
+    loop, expected = timed(
+        lambda: np.array(
+            [
+                [similarity_score(query, document) for document in documents]
+                for query in queries
+            ]
+        )
+    )
+    print(f"per-pair loop: {pairs} pairs in {loop:.2f} s")
+
+    normalizing, index = timed(SimilarityIndex, documents)
+    elapsed, scores = timed(index.scores, queries)
+    assert np.allclose(scores, expected, atol=1e-5), "scores differ"
+    print(
+        f"matrix product: {elapsed:.3f} s ({loop / elapsed:.0f}x), "
+        f"normalizing documents once: {normalizing:.3f} s"
+    )
+
+    elapsed, (indexes, _) = timed(index.top_k, queries, args.k)
+    assert (indexes[:, 0] == expected.argmax(axis=1)).all(), "top results differ"
+    print(f"top {args.k} by partial sort: {elapsed:.3f} s")
+
+    # Scoring (query, document) pairs row by row, as relevance judgments come.
+    rows = rng.integers(args.queries, size=args.documents)
+    loop, expected = timed(
+        lambda: [
+            similarity_score(queries[row], document)
+            for row, document in zip(rows, documents)
+        ]
+    )
+    elapsed, scores = timed(paired_scores, queries[rows], documents)
+    assert np.allclose(scores, expected, atol=1e-5), "paired scores differ"
+    print(
+        f"{args.documents} paired scores: {loop:.2f} s in a loop, "
+        f"{elapsed:.3f} s at once ({loop / elapsed:.0f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+import bs4
+from aiohttp import web
+from projects.document_processing.async_web_loader import (
+    CONNECTION_LIMIT,
+    CONNECTION_LIMIT_PER_HOST,
+    WEB_CACHE_DIRECTORY,
+    AsyncWebLoader,
+)
+
+# Run from the project root, with one URL per line in urls.txt:
+#   python -m projects.document_processing.crawl urls.txt --output pages.jsonl
+# Or crawl a local stand-in for a knowledge base, twice, to see the second
+# crawl answered with 304s from the cache:
+#   python -m projects.document_processing.crawl --stand-in 3000 --repeat 2
+
+ARTICLE = """<html lang="ru"><head><title>Статья {index}</title>
+<meta name="description" content="Статья базы знаний {index}"></head><body>
+<nav>Меню</nav><div id="post-content-body">{body}</div></body></html>"""
+
+
+def make_stand_in(articles: int, latency: float) -> web.Application:
+    """A knowledge base serving articles with ETag and Last-Modified."""
+    pages = {}
+    for index in range(articles):
+        body = f"<p>Текст статьи {index} о работе с документами.</p>" * 50
+        page = ARTICLE.format(index=index, body=body).encode("utf-8")
+        pages[str(index)] = (page, f'"{hashlib.sha256(page).hexdigest()[:16]}"')
+    last_modified = "Mon, 01 Sep 2025 00:00:00 GMT"
+
+    async def article(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        page, etag = pages[request.match_info["index"]]
+        headers = {"ETag": etag, "Last-Modified": last_modified}
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers=headers)
+        return web.Response(
+            body=page, content_type="text/html", charset="utf-8", headers=headers
+        )
+
+    app = web.Application()
+    app.router.add_get("/articles/{index}", article)
+    return app
+
+
+async def crawl(args: argparse.Namespace, urls: list[str]):
+    loader = AsyncWebLoader(
+        urls,
+        bs_kwargs={"parse_only": bs4.SoupStrainer(attrs={"id": args.content_id})},
+        cache_directory=args.cache,
+        limit=args.limit,
+        limit_per_host=args.per_host,
+        continue_on_failure=True,
+    )
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    try:
+        for attempt in range(args.repeat):
+            start = time.perf_counter()
+            pages = 0
+            async for document in loader.alazy_load():
+                pages += 1
+                if output is not None and attempt == 0:
+                    output.write(
+                        json.dumps(
+                            {"text": document.page_content, **document.metadata},
+                            ensure_ascii=False,
+                        )
+                        + "\n"
+                    )
+            elapsed = time.perf_counter() - start
+            print(
+                f"crawl {attempt + 1}: {pages} pages in {elapsed:.1f} s, "
+                f"{dict(loader.stats)}"
+            )
+    finally:
+        if output is not None:
+            output.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Crawl web pages into documents")
+    parser.add_argument("urls", nargs="?", help="file with one URL per line")
+    parser.add_argument("--output", help="JSON lines file for the documents")
+    parser.add_argument("--content-id", default="post-content-body")
+    parser.add_argument("--cache", default=WEB_CACHE_DIRECTORY)
+    parser.add_argument("--limit", type=int, default=CONNECTION_LIMIT)
+    parser.add_argument("--per-host", type=int, default=CONNECTION_LIMIT_PER_HOST)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--stand-in", type=int, help="articles of a local server")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds")
+    args = parser.parse_args()
+    if (args.urls is None) == (args.stand_in is None):
+        parser.error("give either a URL file or --stand-in")
+
+    if args.urls is not None:
+        with open(args.urls, encoding="utf-8") as f:
+            urls = [line.strip() for line in f if line.strip()]
+        await crawl(args, urls)
+        return
+
+    runner = web.AppRunner(make_stand_in(args.stand_in, args.latency))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        urls = [
+            f"http://127.0.0.1:{port}/articles/{index}"
+            for index in range(args.stand_in)
+        ]
+        await crawl(args, urls)
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,169 @@
+import hashlib
+from collections import defaultdict
+from typing import Any, Iterable, Iterator, Sequence
+import numpy as np
+from langchain_core.documents import BaseDocumentTransformer, Document
+
+SIMILARITY_THRESHOLD = 0.9
+NUM_PERMUTATIONS = 128
+SHINGLE_SIZE = 5  # characters
+PROVENANCE_KEYS = ("source", "page", "page_label", "start_index")
+SEED = 42
+# Kept chunks that later ones are compared with: about 1 KB each with the
+# default signatures, so memory stays flat however long the stream is.
+MAX_KEPT = 50_000
+
+_BASE = np.uint64(1_000_003)
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """64-bit hashes of the distinct character ``size``-grams of ``text``.
+
+    Case and runs of whitespace are ignored, so a header extracted with other
+    line breaks still matches.
+    """
+    text = " ".join(text.lower().split())
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) == 0:
+        return np.zeros(1, dtype=np.uint64)
+    size = min(size, len(codes))
+    count = len(codes) - size + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        # Polynomial rolling hash, wrapping modulo 2**64.
+        hashes = hashes * _BASE + codes[offset : offset + count]
+    return np.unique(hashes)
+
+
+def lsh_bands(threshold: float, num_permutations: int) -> tuple[int, int]:
+    """Bands and rows per band so that pairs about ``threshold`` similar collide.
+
+    Pairs with Jaccard similarity ``s`` share a bucket with probability
+    ``1 - (1 - s**rows)**bands``, which rises steeply around
+    ``(1 / bands)**(1 / rows)``. The steepest curve whose midpoint is still
+    below ``threshold`` keeps misses rare; candidates are verified anyway.
+    """
+    best = (num_permutations, 1)
+    for rows in range(1, num_permutations + 1):
+        if num_permutations % rows:
+            continue
+        bands = num_permutations // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+class MinHashDeduplicator(BaseDocumentTransformer):
+    """Drop chunks that are near-duplicates of a chunk seen before.
+
+    Similarity is the Jaccard similarity of character shingles, estimated
+    with MinHash signatures; locality-sensitive hashing of signature bands
+    finds candidates without comparing every pair. A chunk whose estimated
+    similarity to a kept chunk reaches ``threshold`` is dropped, and the
+    ``provenance_keys`` of its metadata (where it came from) are appended to
+    the kept chunk's ``duplicates`` metadata with the similarity.
+
+    Only the last ``max_kept`` kept chunks are remembered; a duplicate of an
+    older chunk is kept.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SIMILARITY_THRESHOLD,
+        num_permutations: int = NUM_PERMUTATIONS,
+        shingle_size: int = SHINGLE_SIZE,
+        provenance_keys: Sequence[str] = PROVENANCE_KEYS,
+        seed: int = SEED,
+        max_kept: int = MAX_KEPT,
+    ):
+        self.threshold = threshold
+        self.max_kept = max_kept
+        self.shingle_size = shingle_size
+        self.provenance_keys = tuple(provenance_keys)
+        self.bands, self.rows = lsh_bands(threshold, num_permutations)
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash functions, one per permutation.
+        self._multipliers = rng.integers(
+            1, 2**63, num_permutations, dtype=np.uint64
+        ) * np.uint64(2) + np.uint64(1)
+        self._increments = rng.integers(0, 2**63, num_permutations, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(text, self.shingle_size)
+        permuted = hashes[:, None] * self._multipliers + self._increments
+        return (permuted >> np.uint64(32)).min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> list[tuple[int, bytes]]:
+        return [
+            (band, signature[band * self.rows : (band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def filter(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Yield the documents that are not near-duplicates of earlier ones.
+
+        Works on a stream: kept documents are yielded at once, as copies with
+        their own metadata dict, and later duplicates are recorded in it as
+        they are found. The ``duplicates`` list is replaced, not appended to,
+        so a reader on another thread never sees it change under it.
+        """
+        # Kept chunks by serial number, oldest first.
+        kept: dict[int, tuple[Document, np.ndarray, bytes]] = {}
+        exact: dict[bytes, int] = {}
+        buckets: defaultdict[tuple[int, bytes], list[int]] = defaultdict(list)
+        for serial, document in enumerate(documents):
+            digest = hashlib.blake2b(
+                document.page_content.encode("utf-8"), digest_size=16
+            ).digest()
+            index = exact.get(digest)
+            if index is not None:
+                self._record(kept[index][0], document, 1.0)
+                continue
+            signature = self.signature(document.page_content)
+            keys = self._band_keys(signature)
+            candidates = {index for key in keys for index in buckets.get(key, ())}
+            best, similarity = None, 0.0
+            for index in candidates:
+                estimate = float(np.mean(kept[index][1] == signature))
+                if estimate > similarity:
+                    best, similarity = index, estimate
+            if best is not None and similarity >= self.threshold:
+                self._record(kept[best][0], document, similarity)
+                continue
+            document = document.model_copy(update={"metadata": dict(document.metadata)})
+            kept[serial] = (document, signature, digest)
+            exact[digest] = serial
+            for key in keys:
+                buckets[key].append(serial)
+            if len(kept) > self.max_kept:
+                self._forget(kept, exact, buckets)
+            yield document
+
+    def _forget(
+        self,
+        kept: dict[int, tuple[Document, np.ndarray, bytes]],
+        exact: dict[bytes, int],
+        buckets: defaultdict[tuple[int, bytes], list[int]],
+    ):
+        oldest = next(iter(kept))
+        _, signature, digest = kept.pop(oldest)
+        del exact[digest]
+        for key in self._band_keys(signature):
+            serials = buckets[key]
+            serials.remove(oldest)
+            if not serials:
+                del buckets[key]
+
+    def _record(self, kept: Document, dropped: Document, similarity: float):
+        provenance = {
+            key: dropped.metadata[key]
+            for key in self.provenance_keys
+            if key in dropped.metadata
+        }
+        provenance["similarity"] = round(similarity, 3)
+        kept.metadata["duplicates"] = [*kept.metadata.get("duplicates", ()), provenance]
+
+    def transform_documents(
+        self, documents: Sequence[Document], **kwargs: Any
+    ) -> Sequence[Document]:
+        return list(self.filter(documents))
@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from typing import Literal, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embeddings.sqlite")
+MEMORY_CACHE_SIZE = 10_000  # vectors
+SQLITE_MAX_PARAMETERS = 500
+
+Kind = Literal["document", "query"]
+
+
+def embeddings_namespace(embeddings: Embeddings) -> str:
+    """Identify the vectors ``embeddings`` computes: model and encoding settings.
+
+    For HuggingFaceEmbeddings that is the model name and the encode kwargs,
+    which hold ``normalize_embeddings`` and the query prompt of instruct models.
+    Wrappers that only change how texts are batched, with the wrapped model in
+    an ``embeddings`` attribute, are looked through.
+    """
+    while isinstance(getattr(embeddings, "embeddings", None), Embeddings):
+        embeddings = embeddings.embeddings
+    settings = {"class": type(embeddings).__name__}
+    for name in (
+        "model_name",
+        "model",
+        "encode_kwargs",
+        "query_encode_kwargs",
+        "size",
+    ):
+        value = getattr(embeddings, name, None)
+        if value is not None:
+            settings[name] = value
+    return json.dumps(settings, sort_keys=True, default=str)
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings served from memory or disk when the text was embedded before.
+
+    Vectors are keyed by the model and its settings (see
+    ``embeddings_namespace``), by kind, since instruct models embed a query
+    differently from a document with the same text, and by the text's sha256.
+    The most recently used ``memory_size`` vectors stay in memory, all of them
+    in a SQLite database shared by processes, both as float32 like
+    sentence-transformers computes them. The database is ``path``, by default
+    ``EMBEDDING_CACHE_PATH`` or embeddings.sqlite in the current directory.
+    ``stats`` counts memory hits, disk hits and misses, once per distinct text
+    of a call.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        path: str = EMBEDDING_CACHE_PATH,
+        memory_size: int = MEMORY_CACHE_SIZE,
+        namespace: Optional[str] = None,
+    ):
+        self.embeddings = embeddings
+        self.namespace = namespace or embeddings_namespace(embeddings)
+        self.memory_size = memory_size
+        self.stats: Counter[str] = Counter()
+        # float32 arrays: an eighth of the memory of lists of Python floats.
+        self._memory: OrderedDict[tuple[Kind, bytes], np.ndarray] = OrderedDict()
+        # Ingestion embeds from worker threads, share one connection.
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "namespace TEXT, kind TEXT, key BLOB, vector BLOB, "
+                "PRIMARY KEY (namespace, kind, key)) WITHOUT ROWID"
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _remember(self, kind: Kind, key: bytes, vector: np.ndarray):
+        self._memory[kind, key] = vector
+        self._memory.move_to_end((kind, key))
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, kind: Kind, keys: list[bytes]) -> dict[bytes, np.ndarray]:
+        unique = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for key in unique:
+                vector = self._memory.get((kind, key))
+                if vector is not None:
+                    self._memory.move_to_end((kind, key))
+                    found[key] = vector
+            self.stats["memory_hits"] += len(found)
+            missing = [key for key in unique if key not in found]
+            for start in range(0, len(missing), SQLITE_MAX_PARAMETERS):
+                batch = missing[start : start + SQLITE_MAX_PARAMETERS]
+                rows = self._connection.execute(
+                    "SELECT key, vector FROM embeddings "
+                    "WHERE namespace = ? AND kind = ? "
+                    f"AND key IN ({', '.join('?' * len(batch))})",
+                    [self.namespace, kind, *batch],
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(kind, key, vector)
+                self.stats["disk_hits"] += len(rows)
+            self.stats["misses"] += len(unique) - len(found)
+        return found
+
+    def _store(self, kind: Kind, vectors: dict[bytes, list[float]]):
+        rows = []
+        for key, vector in vectors.items():
+            # Served as float32 from now on, like vectors read back later.
+            vectors[key] = np.asarray(vector, dtype=np.float32)
+            rows.append((self.namespace, kind, key, vectors[key].tobytes()))
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows
+            )
+            for key, vector in vectors.items():
+                self._remember(kind, key, vector)
+
+    def _missing(
+        self, texts: list[str], keys: list[bytes], found: dict[bytes, np.ndarray]
+    ) -> dict[bytes, str]:
+        # The same text twice in a batch is embedded once.
+        return {key: text for key, text in zip(keys, texts) if key not in found}
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [text_key(text) for text in texts]
+        found = self._lookup("document", keys)
+        missing = self._missing(texts, keys, found)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing, vectors))
+            self._store("document", computed)
+            found.update(computed)
+        return [found[key].tolist() for key in keys]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [text_key(text) for text in texts]
+        found = await asyncio.to_thread(self._lookup, "document", keys)
+        missing = self._missing(texts, keys, found)
+        if missing:
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            computed = dict(zip(missing, vectors))
+            await asyncio.to_thread(self._store, "document", computed)
+            found.update(computed)
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        key = text_key(text)
+        found = self._lookup("query", [key])
+        if key not in found:
+            found[key] = self.embeddings.embed_query(text)
+            self._store("query", found)
+        return found[key].tolist()
+
+    async def aembed_query(self, text: str) -> list[float]:
+        key = text_key(text)
+        found = await asyncio.to_thread(self._lookup, "query", [key])
+        if key not in found:
+            found[key] = await self.embeddings.aembed_query(text)
+            await asyncio.to_thread(self._store, "query", found)
+        return found[key].tolist()
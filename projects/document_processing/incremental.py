@@ -0,0 +1,92 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_pages(documents: Iterable[Document], hashes: list[str]) -> Iterator[Document]:
+    """Pass pages through, appending the hash of each one's text to ``hashes``."""
+    for document in documents:
+        hashes.append(content_hash(document.page_content))
+        yield document
+
+
+@dataclass
+class SourceVersion:
+    """The indexed version of a document, as known by its source name."""
+
+    source: str
+    sha256: str
+    pages: list[str] = field(default_factory=list)
+
+    def changed_pages(self, pages: list[str]) -> int:
+        """Count pages of a new version whose text this version doesn't have."""
+        known = set(self.pages)
+        return sum(page not in known for page in pages)
+
+
+class ReusedEmbeddings(Embeddings):
+    """Embeddings that only compute vectors for texts not seen before.
+
+    Seeded with the chunks of a previous version of a document, indexing the
+    next version embeds only the chunks whose text changed; the others get
+    their previous vector back. Chunks that are gone are simply never added to
+    the new index. ``embedded`` and ``reused`` count texts of each kind.
+    """
+
+    def __init__(self, embeddings: Embeddings, vectors: dict[str, list[float]]):
+        self.embeddings = embeddings
+        self.vectors = vectors
+        self.embedded = 0
+        self.reused = 0
+
+    @classmethod
+    def from_vectorstore(
+        cls, embeddings: Embeddings, vectorstore: InMemoryVectorStore
+    ) -> "ReusedEmbeddings":
+        return cls(
+            embeddings,
+            {
+                content_hash(record["text"]): record["vector"]
+                for record in vectorstore.store.values()
+            },
+        )
+
+    def _missing(self, hashes: list[str], texts: list[str]) -> list[str]:
+        # The same text twice in a batch is embedded once.
+        missing = {
+            digest: text
+            for digest, text in zip(hashes, texts)
+            if digest not in self.vectors
+        }
+        self.embedded += len(missing)
+        self.reused += len(texts) - len(missing)
+        return list(missing.values())
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        hashes = [content_hash(text) for text in texts]
+        missing = self._missing(hashes, texts)
+        if missing:
+            vectors = self.embeddings.embed_documents(missing)
+            self.vectors.update(zip(map(content_hash, missing), vectors))
+        return [self.vectors[digest] for digest in hashes]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        hashes = [content_hash(text) for text in texts]
+        missing = self._missing(hashes, texts)
+        if missing:
+            vectors = await self.embeddings.aembed_documents(missing)
+            self.vectors.update(zip(map(content_hash, missing), vectors))
+        return [self.vectors[digest] for digest in hashes]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.embeddings.aembed_query(text)
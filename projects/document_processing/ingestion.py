@@ -0,0 +1,205 @@
+import dataclasses
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from .batching import TokenBudgetEmbeddings
+from .deduplication import MinHashDeduplicator
+from .embedding_cache import CachedEmbeddings
+from .incremental import ReusedEmbeddings, SourceVersion, content_hash, hash_pages
+from .parallel_loader import ParallelPyPDFLoader
+from .pipeline import index_documents
+
+EMBEDDING_MODEL = "intfloat/multilingual-e5-large-instruct"
+CHUNK_SIZE = 300
+CHUNK_OVERLAP = 100
+# Written by the files API workers and read by the chat prototype, so both
+# must run with the same directory (by default, both started from the root).
+INDEX_DIRECTORY = os.getenv("DOCUMENT_INDEX_DIRECTORY", "indexes")
+# Embed documents in batches of similar token length (TokenBudgetEmbeddings).
+# Opt-in until benchmark_embeddings has been run against the deployed model.
+TOKEN_BATCHING = os.getenv("DOCUMENT_TOKEN_BATCHING") == "1"
+# Latest indexed version of each source name, to re-index revisions
+# incrementally.
+SOURCES_DIRECTORY = "sources"
+
+
+@dataclass
+class IngestionStats:
+    chunks: int
+    embedded: int
+    changed_pages: int
+    previous: Optional[str] = None
+
+
+@lru_cache
+def get_model() -> Embeddings:
+    # Imported on first use, so that importing this module doesn't load torch.
+    from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+
+
+@lru_cache
+def get_embeddings() -> Embeddings:
+    # Re-uploaded files and repeated questions are looked up, not recomputed.
+    model = get_model()
+    if TOKEN_BATCHING:
+        return CachedEmbeddings(TokenBudgetEmbeddings.from_huggingface(model))
+    return CachedEmbeddings(model)
+
+
+def make_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+    )
+
+
+def make_deduplicator() -> MinHashDeduplicator:
+    # Page headers and footers repeat on every page of a PDF, embed them once.
+    return MinHashDeduplicator()
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_pdf(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(5) == b"%PDF-"
+
+
+def index_path(digest: str, directory: str = INDEX_DIRECTORY) -> str:
+    return os.path.join(directory, f"{digest}.json")
+
+
+def with_source(documents: Iterable[Document], source: str) -> Iterator[Document]:
+    # Stored files live under their digest, keep the name users know.
+    for document in documents:
+        document.metadata["source"] = source
+        yield document
+
+
+def version_path(source: str, directory: str = INDEX_DIRECTORY) -> str:
+    return os.path.join(directory, SOURCES_DIRECTORY, f"{content_hash(source)}.json")
+
+
+def load_version(
+    source: str, directory: str = INDEX_DIRECTORY
+) -> Optional[SourceVersion]:
+    try:
+        with open(version_path(source, directory), encoding="utf-8") as f:
+            return SourceVersion(**json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def save_version(version: SourceVersion, directory: str = INDEX_DIRECTORY):
+    path = version_path(version.source, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(dataclasses.asdict(version), f)
+    os.replace(temp_path, path)
+
+
+def reuse_embeddings(
+    embeddings: Embeddings,
+    version: Optional[SourceVersion],
+    directory: str = INDEX_DIRECTORY,
+) -> ReusedEmbeddings:
+    """Embeddings that reuse the vectors of ``version``'s index, if there is one."""
+    previous = None
+    if version is not None:
+        previous = load_index(version.sha256, embeddings, directory)
+    if previous is None:
+        return ReusedEmbeddings(embeddings, {})
+    return ReusedEmbeddings.from_vectorstore(embeddings, previous)
+
+
+def remove_index(digest: str, directory: str = INDEX_DIRECTORY):
+    try:
+        os.remove(index_path(digest, directory))
+    except FileNotFoundError:
+        pass
+
+
+def build_index(
+    path: str,
+    embeddings: Embeddings,
+    source: Optional[str] = None,
+    pages: Optional[list[str]] = None,
+) -> InMemoryVectorStore:
+    """Index a PDF; with ``pages``, the hash of each page is appended to it."""
+    documents = ParallelPyPDFLoader(path).lazy_load()
+    if source is not None:
+        documents = with_source(documents, source)
+    if pages is not None:
+        documents = hash_pages(documents, pages)
+    vectorstore = InMemoryVectorStore(embeddings)
+    index_documents(
+        documents, vectorstore, make_splitter(), deduplicator=make_deduplicator()
+    )
+    return vectorstore
+
+
+def save_index(
+    vectorstore: InMemoryVectorStore, digest: str, directory: str = INDEX_DIRECTORY
+):
+    path = index_path(digest, directory)
+    # Readers never see a half-written index.
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    vectorstore.dump(temp_path)
+    os.replace(temp_path, path)
+
+
+def load_index(
+    digest: str,
+    embeddings: Optional[Embeddings] = None,
+    directory: str = INDEX_DIRECTORY,
+) -> Optional[InMemoryVectorStore]:
+    path = index_path(digest, directory)
+    if not os.path.exists(path):
+        return None
+    return InMemoryVectorStore.load(path, embeddings or get_embeddings())
+
+
+def ingest(
+    path: str,
+    digest: str,
+    embeddings: Optional[Embeddings] = None,
+    directory: str = INDEX_DIRECTORY,
+    source: Optional[str] = None,
+) -> IngestionStats:
+    """Index a PDF under its content digest.
+
+    With a ``source`` name, the index of the previously ingested version of
+    that source is reused: only chunks whose text changed are embedded, and
+    the new index holds no chunks of the old text. The previous index is left
+    for the caller to remove once nothing refers to its version.
+    """
+    embeddings = embeddings or get_embeddings()
+    previous = None if source is None else load_version(source, directory)
+    reused = reuse_embeddings(embeddings, previous, directory)
+    pages = []
+    vectorstore = build_index(path, reused, source, pages)
+    # The index is saved with whatever embeddings it is loaded with.
+    save_index(vectorstore, digest, directory)
+    if source is not None:
+        save_version(SourceVersion(source, digest, pages), directory)
+    return IngestionStats(
+        chunks=len(vectorstore.store),
+        embedded=reused.embedded,
+        changed_pages=len(pages) if previous is None else previous.changed_pages(pages),
+        previous=None if previous is None else previous.sha256,
+    )
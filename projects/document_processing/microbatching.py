@@ -0,0 +1,165 @@
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Literal, Optional
+from langchain_core.embeddings import Embeddings
+from .batching import TokenBudgetEmbeddings, encode, sentence_transformer
+
+MAX_BATCH_SIZE = 64  # texts
+MAX_WAIT = 0.005  # seconds
+
+Kind = Literal["document", "query"]
+
+
+@dataclass
+class _Request:
+    texts: list[str]
+    future: asyncio.Future = field(repr=False)
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """Embedding service that batches concurrent async requests together.
+
+    Async requests wait at most ``max_wait`` for others to join them, up to
+    ``max_batch_size`` texts, and each batch is one forward pass. Passes run
+    one at a time on a dedicated thread, so concurrent chats queue for the
+    cores instead of splitting them between many batch-of-one passes.
+    Queries and documents are batched separately, since instruct models embed
+    them differently. Sync calls go straight to the wrapped embeddings.
+
+    ``metrics()`` reports queue depths and batch sizes.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        embed_queries: Optional[Callable[[list[str]], list[list[float]]]] = None,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait: float = MAX_WAIT,
+    ):
+        self.embeddings = embeddings
+        self.embed_queries = embed_queries or (
+            lambda texts: [embeddings.embed_query(text) for text in texts]
+        )
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats: Counter[str] = Counter()
+        self._largest_batch = 0
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="embeddings")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queues: dict[Kind, asyncio.Queue[_Request]] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    @classmethod
+    def from_huggingface(
+        cls, embeddings: Embeddings, token_batching: bool = False, **kwargs
+    ) -> "MicroBatchingEmbeddings":
+        """Serve ``HuggingFaceEmbeddings``, with query batches in one pass.
+
+        With ``token_batching``, document batches are embedded by
+        ``TokenBudgetEmbeddings``.
+        """
+
+        def embed_queries(texts: list[str]) -> list[list[float]]:
+            encode_kwargs = embeddings.query_encode_kwargs or embeddings.encode_kwargs
+            return encode(embeddings, texts, encode_kwargs)
+
+        # Refuse an unsupported model now rather than at the first question.
+        sentence_transformer(embeddings)
+        documents = embeddings
+        if token_batching:
+            documents = TokenBudgetEmbeddings.from_huggingface(embeddings)
+        return cls(documents, embed_queries, **kwargs)
+
+    def _start(self):
+        # Collectors belong to the event loop that uses the service first.
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queues = {"query": asyncio.Queue(), "document": asyncio.Queue()}
+        self._tasks = [
+            loop.create_task(self._collect(kind, queue))
+            for kind, queue in self._queues.items()
+        ]
+
+    async def aclose(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    async def _collect(self, kind: Kind, queue: asyncio.Queue[_Request]):
+        loop = asyncio.get_running_loop()
+        embed = (
+            self.embed_queries if kind == "query" else self.embeddings.embed_documents
+        )
+        while True:
+            batch = [await queue.get()]
+            size = len(batch[0].texts)
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        request = await queue.get()
+                except TimeoutError:
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            texts = [text for request in batch for text in request.texts]
+            try:
+                vectors = await loop.run_in_executor(self._executor, embed, texts)
+            except Exception as error:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(error)
+                continue
+            self.stats[f"{kind}_batches"] += 1
+            self.stats[f"{kind}_requests"] += len(batch)
+            self.stats[f"{kind}_texts"] += len(texts)
+            self._largest_batch = max(self._largest_batch, len(texts))
+            start = 0
+            for request in batch:
+                stop = start + len(request.texts)
+                # A caller that gave up has a cancelled future.
+                if not request.future.done():
+                    request.future.set_result(vectors[start:stop])
+                start = stop
+
+    async def _submit(self, kind: Kind, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        self._start()
+        request = _Request(texts, asyncio.get_running_loop().create_future())
+        self._queues[kind].put_nowait(request)
+        return await request.future
+
+    def metrics(self) -> dict:
+        metrics = {
+            "queue_depth": {
+                kind: queue.qsize() for kind, queue in self._queues.items()
+            },
+            "largest_batch": self._largest_batch,
+        }
+        for kind in ("query", "document"):
+            batches = self.stats[f"{kind}_batches"]
+            metrics[f"{kind}_batches"] = batches
+            metrics[f"{kind}_mean_batch_size"] = (
+                self.stats[f"{kind}_texts"] / batches if batches else 0.0
+            )
+        return metrics
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self._submit("document", texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        (vector,) = await self._submit("query", [text])
+        return vector
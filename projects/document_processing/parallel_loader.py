@@ -0,0 +1,185 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Iterator, Literal, Optional, Union
+import pypdf
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+PAGES_PER_SHARD = 32
+# Workers start from a clean process, not a fork of one running threads.
+START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+def purge_metadata(metadata: dict[str, Any]) -> dict[str, Any]:
+    """Normalize a PDF info dictionary into metadata the way PyPDFLoader does.
+
+    Keys lose their leading slash and are lowercased, dates become ISO 8601,
+    other values strings, so documents carry identical metadata whichever
+    loader produced them.
+    """
+    purged: dict[str, Any] = {}
+    for key, value in metadata.items():
+        if type(value) not in (str, int):
+            value = str(value)
+        key = key.removeprefix("/").lower()
+        if key in ("creationdate", "moddate"):
+            try:
+                purged[key] = datetime.strptime(
+                    value.replace("'", ""), "D:%Y%m%d%H%M%S%z"
+                ).isoformat("T")
+            except ValueError:
+                purged[key] = value
+        elif key in ("page_count", "file_path"):
+            purged[{"page_count": "total_pages", "file_path": "source"}[key]] = value
+            purged[key] = value
+        elif isinstance(value, str):
+            purged[key] = value.strip()
+        else:
+            purged[key] = value
+    return purged
+
+
+def open_pdf(path: str, password: Optional[str] = None) -> pypdf.PdfReader:
+    return pypdf.PdfReader(path, password=password)
+
+
+@lru_cache(maxsize=2)
+def _worker_pdf(
+    path: str, password: Optional[str], mtime_ns: int, size: int
+) -> pypdf.PdfReader:
+    # A worker usually gets several shards of the same file in a row, keep the
+    # parsed cross-reference table instead of reading it again for each. Only
+    # pool workers call this, and they exit with the pool; a file replaced at
+    # the same path has another mtime or size, so it is opened again.
+    return open_pdf(path, password)
+
+
+def count_pages(path: str, password: Optional[str] = None) -> int:
+    return len(open_pdf(path, password).pages)
+
+
+def extract_pages(
+    reader: pypdf.PdfReader,
+    path: str,
+    start: int,
+    stop: int,
+    extraction_mode: Literal["plain", "layout"] = "plain",
+) -> list[Document]:
+    """Extract pages ``start`` to ``stop`` of a PDF the way PyPDFLoader does."""
+    metadata = purge_metadata(
+        {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+        | dict(reader.metadata or {})
+        | {"source": path, "total_pages": len(reader.pages)}
+    )
+    return [
+        Document(
+            page_content=reader.pages[page]
+            .extract_text(extraction_mode=extraction_mode)
+            .strip(),
+            metadata=metadata | {"page": page, "page_label": reader.page_labels[page]},
+        )
+        for page in range(start, stop)
+    ]
+
+
+def load_pages(
+    path: str,
+    start: int,
+    stop: int,
+    password: Optional[str] = None,
+    extraction_mode: Literal["plain", "layout"] = "plain",
+) -> list[Document]:
+    return extract_pages(open_pdf(path, password), path, start, stop, extraction_mode)
+
+
+def _load_shard(
+    path: str,
+    start: int,
+    stop: int,
+    password: Optional[str] = None,
+    extraction_mode: Literal["plain", "layout"] = "plain",
+) -> list[Document]:
+    stat = os.stat(path)
+    reader = _worker_pdf(path, password, stat.st_mtime_ns, stat.st_size)
+    return extract_pages(reader, path, start, stop, extraction_mode)
+
+
+class ParallelPyPDFLoader(BaseLoader):
+    """Load PDFs page by page on a pool of processes.
+
+    Every file is cut into shards of consecutive pages and the shards are
+    spread over the workers, so both long documents and many files use all
+    cores. Documents come out in file order, then page order, with the same
+    content and metadata as ``PyPDFLoader(path).load()``. Only a few shards per
+    worker are in flight at a time, so ``lazy_load`` doesn't hold whole files.
+    """
+
+    def __init__(
+        self,
+        file_paths: Union[str, list[str]],
+        max_workers: Optional[int] = None,
+        pages_per_shard: int = PAGES_PER_SHARD,
+        password: Optional[str] = None,
+        extraction_mode: Literal["plain", "layout"] = "plain",
+    ):
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+        self.file_paths = [str(path) for path in file_paths]
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_shard = pages_per_shard
+        self.password = password
+        self.extraction_mode = extraction_mode
+
+    def lazy_load(self) -> Iterator[Document]:
+        shards = [
+            (path, start, min(start + self.pages_per_shard, pages))
+            for path in self.file_paths
+            for pages in [count_pages(path, self.password)]
+            for start in range(0, pages, self.pages_per_shard)
+        ]
+        if len(shards) <= 1 or self.max_workers == 1:
+            # Not worth starting processes for. Each file is parsed once and
+            # released when its pages are done.
+            reader = None
+            for path, start, stop in shards:
+                if start == 0:
+                    reader = open_pdf(path, self.password)
+                yield from extract_pages(
+                    reader, path, start, stop, self.extraction_mode
+                )
+            return
+        with ProcessPoolExecutor(
+            min(self.max_workers, len(shards)),
+            mp_context=multiprocessing.get_context(START_METHOD),
+        ) as executor:
+            pending: deque[Future] = deque()
+            shards_left = iter(shards)
+            for shard in shards_left:
+                pending.append(
+                    executor.submit(
+                        _load_shard, *shard, self.password, self.extraction_mode
+                    )
+                )
+                if len(pending) >= 2 * self.max_workers:
+                    break
+            try:
+                while pending:
+                    documents = pending.popleft().result()
+                    shard = next(shards_left, None)
+                    if shard is not None:
+                        pending.append(
+                            executor.submit(
+                                _load_shard, *shard, self.password, self.extraction_mode
+                            )
+                        )
+                    yield from documents
+            finally:
+                # The caller may stop early, don't extract what nobody reads.
+                for future in pending:
+                    future.cancel()
@@ -0,0 +1,171 @@
+import asyncio
+import queue
+import threading
+from typing import Awaitable, Callable, Iterable, Iterator, Optional, TypeVar, Union
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from langchain_text_splitters import TextSplitter
+from .deduplication import MinHashDeduplicator
+
+EMBED_BATCH_SIZE = 64
+# Batches split ahead of the embedder. When it falls behind, loading and
+# splitting wait, so memory holds at most this many batches.
+QUEUE_SIZE = 4
+POLL_INTERVAL = 0.1  # seconds
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+def iter_chunks(
+    documents: Iterable[Document], splitter: TextSplitter
+) -> Iterator[Document]:
+    # Splitting page by page gives the same chunks as split_documents(pages).
+    for document in documents:
+        yield from splitter.split_documents([document])
+
+
+def iter_batches(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _put(batches: queue.Queue, item: object, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            batches.put(item, timeout=POLL_INTERVAL)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(batches: queue.Queue, stop: threading.Event) -> Optional[list[Document]]:
+    while not stop.is_set():
+        try:
+            item = batches.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            continue
+        if item is _DONE:
+            return None
+        if isinstance(item, BaseException):
+            raise item
+        return item
+    return None
+
+
+def _produce(
+    documents: Iterable[Document],
+    splitter: TextSplitter,
+    deduplicator: Optional[MinHashDeduplicator],
+    batch_size: int,
+    batches: queue.Queue,
+    stop: threading.Event,
+):
+    try:
+        chunks = iter_chunks(documents, splitter)
+        if deduplicator is not None:
+            # Kept chunks are inserted before their later duplicates are found;
+            # stores holding the metadata dict, like InMemoryVectorStore, still
+            # get the provenance of every dropped duplicate.
+            chunks = deduplicator.filter(chunks)
+        for batch in iter_batches(chunks, batch_size):
+            if not _put(batches, batch, stop):
+                return
+        _put(batches, _DONE, stop)
+    except BaseException as error:
+        # Handed to the consumer, which raises it in the caller.
+        _put(batches, error, stop)
+    finally:
+        # Let a lazy loader release its file and workers if we stopped early.
+        close = getattr(documents, "close", None)
+        if close is not None:
+            close()
+
+
+def _start_producer(
+    documents: Iterable[Document],
+    splitter: TextSplitter,
+    deduplicator: Optional[MinHashDeduplicator],
+    batch_size: int,
+    queue_size: int,
+) -> tuple[queue.Queue, threading.Event, threading.Thread]:
+    batches: queue.Queue[Union[list[Document], BaseException, object]] = queue.Queue(
+        queue_size
+    )
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_produce,
+        args=(documents, splitter, deduplicator, batch_size, batches, stop),
+        daemon=True,
+    )
+    producer.start()
+    return batches, stop, producer
+
+
+def index_documents(
+    documents: Iterable[Document],
+    vectorstore: VectorStore,
+    splitter: TextSplitter,
+    batch_size: int = EMBED_BATCH_SIZE,
+    queue_size: int = QUEUE_SIZE,
+    deduplicator: Optional[MinHashDeduplicator] = None,
+) -> int:
+    """Split, embed and insert documents as they are loaded.
+
+    Pass a lazy iterable such as ``loader.lazy_load()``: a thread loads and
+    splits while the caller embeds and inserts batch by batch, so memory stays
+    flat and each batch is searchable as soon as it is inserted. Returns the
+    number of chunks indexed. With a ``deduplicator``, near-duplicate chunks
+    are dropped before they are embedded.
+    """
+    batches, stop, producer = _start_producer(
+        documents, splitter, deduplicator, batch_size, queue_size
+    )
+    total = 0
+    try:
+        while (batch := _get(batches, stop)) is not None:
+            vectorstore.add_documents(batch)
+            total += len(batch)
+    finally:
+        stop.set()
+        producer.join()
+    return total
+
+
+async def aindex_documents(
+    documents: Iterable[Document],
+    vectorstore: VectorStore,
+    splitter: TextSplitter,
+    batch_size: int = EMBED_BATCH_SIZE,
+    queue_size: int = QUEUE_SIZE,
+    deduplicator: Optional[MinHashDeduplicator] = None,
+    on_progress: Optional[Callable[[int], Awaitable[None]]] = None,
+) -> int:
+    """Async ``index_documents`` for vector stores shared with the event loop.
+
+    Batches are inserted on the event loop, so searches running meanwhile
+    never see a store in the middle of an update. ``on_progress`` is awaited
+    with the number of chunks indexed so far after every batch.
+    """
+    batches, stop, producer = _start_producer(
+        documents, splitter, deduplicator, batch_size, queue_size
+    )
+    total = 0
+    try:
+        while (batch := await asyncio.to_thread(_get, batches, stop)) is not None:
+            await vectorstore.aadd_documents(batch)
+            total += len(batch)
+            if on_progress is not None:
+                await on_progress(total)
+    finally:
+        stop.set()
+        await asyncio.to_thread(producer.join)
+    return total
@@ -0,0 +1,422 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import uuid
+from typing import Any, Callable, Iterable, Literal, Optional, Sequence
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from .scoring import SimilarityIndex, normalize, top_k
+
+Mode = Literal["int8", "binary"]
+
+# Candidates rescored with the float vectors, per result asked for.
+RESCORE_FACTORS = {"int8": 4, "binary": 64}
+SCAN_ROWS = 65_536  # codes converted to float at a time
+FIT_SAMPLE = 100_000  # vectors the quantizer is fitted on
+VECTORS_FILE = "vectors.f32"
+DOCUMENTS_FILE = "documents.json"
+CODES_FILE = "codes.npz"
+
+
+class Quantizer:
+    """Per-dimension scalar (int8) or sign (1 bit) codes of float vectors.
+
+    Dimensions are centered on their mean over a calibration sample; int8
+    codes scale the largest deviation seen to 127 and clip the rest, binary
+    codes keep whether a value is above the mean, packed 8 to a byte and
+    padded to whole 64-bit words.
+    """
+
+    def __init__(self, mode: Mode, center: np.ndarray, scale: np.ndarray):
+        self.mode = mode
+        self.center = center.astype(np.float32)
+        self.scale = scale.astype(np.float32)
+
+    @classmethod
+    def fit(cls, mode: Mode, vectors: np.ndarray) -> "Quantizer":
+        center = vectors.mean(axis=0)
+        deviation = np.abs(vectors - center).max(axis=0)
+        return cls(mode, center, np.where(deviation == 0, 1, deviation) / 127)
+
+    @property
+    def dtype(self) -> type:
+        return np.int8 if self.mode == "int8" else np.uint8
+
+    @property
+    def width(self) -> int:
+        if self.mode == "int8":
+            return len(self.center)
+        return -(-len(self.center) // 64) * 8
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.mode == "int8":
+            codes = np.rint((vectors - self.center) / self.scale)
+            return np.clip(codes, -127, 127).astype(np.int8)
+        bits = np.packbits(vectors > self.center, axis=1)
+        return np.pad(bits, ((0, 0), (0, self.width - bits.shape[1])))
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Rank of each code for ``query``, higher is closer.
+
+        For int8 codes that is the dot product with the query up to a
+        constant; for binary codes, minus the Hamming distance between the
+        code and the query's code.
+        """
+        if self.mode == "int8":
+            weights = query * self.scale
+            scores = np.empty(len(codes), dtype=np.float32)
+            for start in range(0, len(codes), SCAN_ROWS):
+                block = codes[start : start + SCAN_ROWS]
+                scores[start : start + len(block)] = block.astype(np.float32) @ weights
+            return scores
+        words = codes.view(np.uint64)
+        query_words = self.encode(query[None])[0].view(np.uint64)
+        distance = np.bitwise_count(words ^ query_words).sum(axis=1, dtype=np.int32)
+        return -distance
+
+
+class QuantizedVectorStore(VectorStore):
+    """Vector store searching compact quantized codes, rescored exactly.
+
+    Vectors are normalized and their float32 values appended to a file in
+    ``directory``; memory holds only their int8 codes (4x smaller) or binary
+    codes (32x smaller) in one contiguous array. A search scans the codes for
+    ``k * rescore_factor`` candidates and ranks those by cosine similarity
+    with their float vectors, read back through a memory map, so returned
+    scores are exactly InMemoryVectorStore's. The quantizer is fitted again
+    on all vectors each time the store doubles in size.
+
+    ``recall`` measures how many of the exact top results a search finds.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        directory: Optional[str] = None,
+        mode: Mode = "int8",
+        rescore_factor: Optional[int] = None,
+    ):
+        self._setup(embedding, directory, mode, rescore_factor)
+        # A new store starts empty, even in a directory a store was dumped to:
+        # rows left in the file would be read as the vectors of new documents.
+        open(self.vectors_path, "wb").close()
+
+    def _setup(
+        self,
+        embedding: Embeddings,
+        directory: Optional[str],
+        mode: Mode,
+        rescore_factor: Optional[int],
+    ):
+        self.embedding = embedding
+        if directory is None:
+            self._temporary = tempfile.TemporaryDirectory(prefix="vectors-")
+            directory = self._temporary.name
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.mode = mode
+        self.rescore_factor = rescore_factor or RESCORE_FACTORS[mode]
+        self.ids: list[str] = []
+        self.documents: list[Document] = []
+        self.quantizer: Optional[Quantizer] = None
+        self._codes: Optional[np.ndarray] = None
+        self._fitted_size = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.directory, VECTORS_FILE)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory taken by the codes of the vectors in the store."""
+        return 0 if self._codes is None else len(self) * self._codes.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _float_vectors(self, size: int) -> np.ndarray:
+        if self._vectors is None or len(self._vectors) != size:
+            dimensions = len(self.quantizer.center)
+            self._vectors = np.memmap(
+                self.vectors_path, np.float32, "r", shape=(size, dimensions)
+            )
+        return self._vectors
+
+    def _append(self, documents: list[Document], vectors: np.ndarray, ids: list[str]):
+        if not documents:
+            return
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            size = len(self) + len(vectors)
+            if size >= 2 * self._fitted_size:
+                # Refit on all vectors so far: the first batches are a poor sample.
+                self._vectors = None
+                all_vectors = np.memmap(
+                    self.vectors_path, np.float32, "r", shape=(size, vectors.shape[1])
+                )
+                sample = np.random.default_rng(0).choice(
+                    size, min(size, FIT_SAMPLE), replace=False
+                )
+                self.quantizer = Quantizer.fit(self.mode, all_vectors[np.sort(sample)])
+                self._codes = np.empty(
+                    (size, self.quantizer.width), self.quantizer.dtype
+                )
+                for start in range(0, size, SCAN_ROWS):
+                    self._codes[start : start + SCAN_ROWS] = self.quantizer.encode(
+                        all_vectors[start : start + SCAN_ROWS]
+                    )
+                self._fitted_size = size
+            else:
+                if size > len(self._codes):
+                    # Grow by doubling, like a list.
+                    codes = np.empty(
+                        (max(size, 2 * len(self._codes)), self._codes.shape[1]),
+                        self._codes.dtype,
+                    )
+                    codes[: len(self)] = self._codes[: len(self)]
+                    self._codes = codes
+                self._codes[len(self) : size] = self.quantizer.encode(vectors)
+            self.ids.extend(ids)
+            self.documents.extend(documents)
+
+    def _new_ids(
+        self, documents: list[Document], ids: Optional[list[str]]
+    ) -> list[str]:
+        if ids and len(ids) != len(documents):
+            raise ValueError(
+                f"ids must be the same length as documents. "
+                f"Got {len(ids)} ids and {len(documents)} documents."
+            )
+        ids = ids or [document.id for document in documents]
+        return [id or str(uuid.uuid4()) for id in ids]
+
+    def _with_ids(self, documents: list[Document], ids: list[str]) -> list[Document]:
+        return [
+            Document(
+                id=id, page_content=document.page_content, metadata=document.metadata
+            )
+            for document, id in zip(documents, ids)
+        ]
+
+    def add_documents(
+        self, documents: list[Document], ids: Optional[list[str]] = None, **kwargs: Any
+    ) -> list[str]:
+        ids = self._new_ids(documents, ids)
+        vectors = self.embedding.embed_documents(
+            [document.page_content for document in documents]
+        )
+        self._append(self._with_ids(documents, ids), vectors, ids)
+        return ids
+
+    async def aadd_documents(
+        self, documents: list[Document], ids: Optional[list[str]] = None, **kwargs: Any
+    ) -> list[str]:
+        ids = self._new_ids(documents, ids)
+        vectors = await self.embedding.aembed_documents(
+            [document.page_content for document in documents]
+        )
+        await asyncio.to_thread(
+            self._append, self._with_ids(documents, ids), vectors, ids
+        )
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict]] = None,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        texts = list(texts)
+        documents = [
+            Document(page_content=text, metadata=metadata)
+            for text, metadata in zip(texts, metadatas or [{}] * len(texts))
+        ]
+        return self.add_documents(documents, ids)
+
+    def get_by_ids(self, ids: Sequence[str], /) -> list[Document]:
+        positions = {id: index for index, id in enumerate(self.ids)}
+        return [self.documents[positions[id]] for id in ids if id in positions]
+
+    def _search(
+        self,
+        query: np.ndarray,
+        k: int,
+        filter: Optional[Callable[[Document], bool]] = None,
+    ) -> list[tuple[int, float]]:
+        with self._lock:
+            size = len(self)
+            if size == 0:
+                return []
+            codes = self._codes[:size]
+            quantizer = self.quantizer
+            vectors = self._float_vectors(size)
+        query = normalize(np.asarray(query, dtype=np.float32))
+        scores = quantizer.scores(codes, query).astype(np.float32)
+        if filter is not None:
+            allowed = np.fromiter(
+                (filter(document) for document in self.documents[:size]), bool, size
+            )
+            scores[~allowed] = -np.inf
+            k = min(k, int(allowed.sum()))
+        if k <= 0:
+            return []
+        candidates = np.sort(top_k(scores, k * self.rescore_factor))
+        # Filtered out documents can still be candidates when few pass.
+        candidates = candidates[np.isfinite(scores[candidates])]
+        exact = vectors[candidates] @ query
+        best = top_k(exact, k)
+        return [(int(candidates[index]), float(exact[index])) for index in best]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: Optional[Callable[[Document], bool]] = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        return [
+            (self.documents[index], score)
+            for index, score in self._search(embedding, k, filter)
+        ]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        embedding = self.embedding.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+
+    async def asimilarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        embedding = await self.embedding.aembed_query(query)
+        return await asyncio.to_thread(
+            self.similarity_search_with_score_by_vector, embedding, k, **kwargs
+        )
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        return [
+            document
+            for document, _ in self.similarity_search_with_score_by_vector(
+                embedding, k, **kwargs
+            )
+        ]
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        return [
+            document
+            for document, _ in self.similarity_search_with_score(query, k, **kwargs)
+        ]
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        return [
+            document
+            for document, _ in await self.asimilarity_search_with_score(
+                query, k, **kwargs
+            )
+        ]
+
+    def exact_search(self, queries: np.ndarray, k: int = 4) -> np.ndarray:
+        """Indexes of the exact top ``k`` of each query, by a float scan."""
+        with self._lock:
+            vectors = self._float_vectors(len(self))
+        indexes, _ = SimilarityIndex(vectors, normalized=True).top_k(queries, k)
+        return indexes
+
+    def recall(self, queries: np.ndarray, k: int = 4) -> float:
+        """Mean share of each query's exact top ``k`` that a search returns."""
+        expected = self.exact_search(queries, k)
+        shares = []
+        for query, indexes in zip(np.asarray(queries, dtype=np.float32), expected):
+            found = {index for index, _ in self._search(query, k)}
+            shares.append(len(found & set(indexes.tolist())) / len(indexes))
+        return float(np.mean(shares))
+
+    def dump(self):
+        """Save documents and codes next to the float vectors."""
+        with self._lock:
+            size = len(self)
+            with open(
+                os.path.join(self.directory, DOCUMENTS_FILE), "w", encoding="utf-8"
+            ) as f:
+                json.dump(
+                    {
+                        "mode": self.mode,
+                        "documents": [
+                            {"id": id, "text": d.page_content, "metadata": d.metadata}
+                            for id, d in zip(self.ids, self.documents)
+                        ],
+                    },
+                    f,
+                    ensure_ascii=False,
+                )
+            if self.quantizer is not None:
+                np.savez(
+                    os.path.join(self.directory, CODES_FILE),
+                    codes=self._codes[:size],
+                    center=self.quantizer.center,
+                    scale=self.quantizer.scale,
+                    fitted_size=self._fitted_size,
+                )
+
+    @classmethod
+    def load(
+        cls, directory: str, embedding: Embeddings, **kwargs: Any
+    ) -> "QuantizedVectorStore":
+        with open(os.path.join(directory, DOCUMENTS_FILE), encoding="utf-8") as f:
+            saved = json.load(f)
+        # Not through __init__, which empties the vectors file.
+        store = cls.__new__(cls)
+        store._setup(embedding, directory, saved["mode"], kwargs.get("rescore_factor"))
+        store.ids = [record["id"] for record in saved["documents"]]
+        store.documents = [
+            Document(
+                id=record["id"],
+                page_content=record["text"],
+                metadata=record["metadata"],
+            )
+            for record in saved["documents"]
+        ]
+        if store.ids:
+            with np.load(os.path.join(directory, CODES_FILE)) as codes:
+                store.quantizer = Quantizer(store.mode, codes["center"], codes["scale"])
+                store._codes = codes["codes"]
+                store._fitted_size = int(codes["fitted_size"])
+        # Drop vectors appended after the last dump.
+        with open(store.vectors_path, "ab") as f:
+            f.truncate(
+                0
+                if store.quantizer is None
+                else len(store) * store.quantizer.scale.nbytes
+            )
+        return store
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: Optional[list[dict]] = None,
+        **kwargs: Any,
+    ) -> "QuantizedVectorStore":
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas)
+        return store
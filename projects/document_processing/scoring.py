@@ -0,0 +1,123 @@
+import os
+from typing import Iterable
+import numpy as np
+
+CHUNK_ROWS = 65_536  # document vectors scored at a time
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    # Dot products of normalized vectors are the cosine similarities
+    # InMemoryVectorStore ranks by.
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the ``k`` highest scores along the last axis, highest first.
+
+    A partial sort finds the ``k`` best, and only those are sorted.
+    """
+    count = scores.shape[-1]
+    k = min(k, count)
+    if k < count:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(count), scores.shape)
+    order = np.argsort(
+        -np.take_along_axis(scores, candidates, axis=-1), axis=-1, kind="stable"
+    )
+    return np.take_along_axis(candidates, order, axis=-1)
+
+
+def paired_scores(queries: np.ndarray, documents: np.ndarray) -> np.ndarray:
+    """Cosine similarity of each query with the document on the same row."""
+    queries = np.asarray(queries, dtype=np.float32)
+    documents = np.asarray(documents, dtype=np.float32)
+    # Row norms and dot products without normalized copies of both matrices.
+    norms = np.sqrt(
+        np.einsum("ij,ij->i", queries, queries)
+        * np.einsum("ij,ij->i", documents, documents)
+    )
+    dots = np.einsum("ij,ij->i", queries, documents)
+    return dots / np.where(norms == 0, 1, norms)
+
+
+class SimilarityIndex:
+    """Normalized document vectors, scored against many queries at once.
+
+    Documents are normalized once, so cosine similarities of all queries with
+    all documents are one matrix product. Documents are scored
+    ``chunk_rows`` at a time, so a matrix memory-mapped from a file larger
+    than memory (see ``save`` and ``load``) is read through once per call.
+    Only ``top_k`` also keeps its result small; ``scores`` returns the whole
+    queries by documents matrix.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        normalized: bool = False,
+        chunk_rows: int = CHUNK_ROWS,
+    ):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.vectors = vectors if normalized else normalize(vectors)
+        self.chunk_rows = chunk_rows
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @staticmethod
+    def save(batches: Iterable[np.ndarray], path: str) -> int:
+        """Append batches of vectors, normalized, to a float32 file."""
+        rows = 0
+        with open(path, "ab") as f:
+            for batch in batches:
+                batch = normalize(np.asarray(batch, dtype=np.float32))
+                f.write(batch.tobytes())
+                rows += len(batch)
+        return rows
+
+    @classmethod
+    def load(
+        cls, path: str, dimensions: int, chunk_rows: int = CHUNK_ROWS
+    ) -> "SimilarityIndex":
+        rows = os.path.getsize(path) // (dimensions * 4)
+        vectors = np.memmap(path, np.float32, "r", shape=(rows, dimensions))
+        return cls(vectors, normalized=True, chunk_rows=chunk_rows)
+
+    def _chunks(self) -> Iterable[tuple[int, np.ndarray]]:
+        for start in range(0, len(self.vectors), self.chunk_rows):
+            yield start, self.vectors[start : start + self.chunk_rows]
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine similarities, a row of all documents per query.
+
+        The result takes 4 bytes per query and document, so it must fit in
+        memory even when the documents don't; use ``top_k`` otherwise.
+        """
+        queries = normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        scores = np.empty((len(queries), len(self.vectors)), dtype=np.float32)
+        for start, chunk in self._chunks():
+            np.matmul(queries, chunk.T, out=scores[:, start : start + len(chunk)])
+        return scores
+
+    def top_k(self, queries: np.ndarray, k: int = 4) -> tuple[np.ndarray, np.ndarray]:
+        """Indexes and scores of the ``k`` best documents of each query.
+
+        Only the best ``k`` of each chunk are kept, so memory does not grow
+        with the number of documents.
+        """
+        queries = normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        indexes = np.empty((len(queries), 0), dtype=np.int64)
+        scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start, chunk in self._chunks():
+            chunk_scores = queries @ chunk.T
+            best = top_k(chunk_scores, k)
+            indexes = np.concatenate([indexes, best + start], axis=1)
+            scores = np.concatenate(
+                [scores, np.take_along_axis(chunk_scores, best, axis=1)], axis=1
+            )
+            best = top_k(scores, k)
+            indexes = np.take_along_axis(indexes, best, axis=1)
+            scores = np.take_along_axis(scores, best, axis=1)
+        return indexes, scores
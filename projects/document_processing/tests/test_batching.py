@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from projects.document_processing.batching import (
+    TokenBudgetEmbeddings,
+    token_batches,
+)
+
+
+def test_batches_cover_each_text_once_longest_first():
+    lengths = [5, 80, 12, 80, 3, 40, 40, 7]
+    batches = list(token_batches(lengths, token_budget=100))
+    indexes = [index for batch in batches for index in batch]
+    assert sorted(indexes) == list(range(len(lengths)))
+    assert [lengths[index] for index in indexes] == sorted(lengths, reverse=True)
+    # Equal lengths keep the order of the texts.
+    assert indexes.index(1) < indexes.index(3)
+    assert indexes.index(5) < indexes.index(6)
+
+
+@pytest.mark.parametrize("budget", [64, 100, 256, 1000])
+def test_batches_stay_under_budget(budget):
+    rng = np.random.default_rng(budget)
+    lengths = rng.integers(1, 300, size=500).tolist()
+    for batch in token_batches(lengths, budget, max_batch_size=32):
+        padded = len(batch) * max(lengths[index] for index in batch)
+        # Only a text longer than the budget may exceed it, alone.
+        assert padded <= budget or len(batch) == 1
+        assert len(batch) <= 32
+
+
+def test_batches_are_full():
+    # 10 texts of 10 tokens under a budget of 30: batches of 3, then the rest.
+    assert [len(batch) for batch in token_batches([10] * 10, 30)] == [3, 3, 3, 1]
+    assert list(token_batches([50, 10], 30)) == [[0], [1]]
+    assert list(token_batches([], 30)) == []
+
+
+class Recorder(Embeddings):
+    def __init__(self):
+        self.fake = DeterministicFakeEmbedding(size=8)
+        self.batches: list[list[str]] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.batches.append(texts)
+        return self.fake.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.fake.embed_query(text)
+
+
+def test_vectors_come_back_in_text_order():
+    texts = ["x" * length for length in (3, 30, 1, 12, 30, 7, 2)]
+    model = Recorder()
+    bucketed = TokenBudgetEmbeddings(
+        model, lambda texts: [len(text) for text in texts], token_budget=40
+    )
+    assert bucketed.embed_documents(texts) == model.fake.embed_documents(texts)
+    assert [len(batch) for batch in model.batches] == [1, 1, 3, 2]
+    assert bucketed.embed_documents([]) == []
+
+
+class FakeSentenceTransformer:
+    max_seq_length = 16
+
+    def __init__(self):
+        self.calls: list[tuple[list[str], dict]] = []
+
+    def tokenizer(self, texts, truncation, max_length):
+        return {"input_ids": [text.split()[:max_length] for text in texts]}
+
+    def encode(self, texts, **kwargs):
+        self.calls.append((texts, kwargs))
+        return np.array([[len(text.split()), 1.0] for text in texts])
+
+
+class FakeHuggingFaceEmbeddings(Recorder):
+    def __init__(self):
+        super().__init__()
+        self._client = FakeSentenceTransformer()
+        self.encode_kwargs = {"normalize_embeddings": True}
+
+
+def test_from_huggingface_encodes_each_batch_in_one_pass():
+    embeddings = FakeHuggingFaceEmbeddings()
+    bucketed = TokenBudgetEmbeddings.from_huggingface(embeddings, token_budget=8)
+    texts = ["a b c d", "a", "a b\nc d e f g h", "a b"]
+    assert bucketed.embed_documents(texts) == [[4, 1], [1, 1], [8, 1], [2, 1]]
+    calls = embeddings._client.calls
+    assert [texts for texts, _ in calls] == [
+        ["a b c d e f g h"],
+        ["a b c d", "a b"],
+        ["a"],
+    ]
+    for texts, kwargs in calls:
+        assert kwargs["batch_size"] == len(texts)
+        assert kwargs["normalize_embeddings"]
+
+
+def test_from_huggingface_refuses_other_embeddings():
+    with pytest.raises(TypeError):
+        TokenBudgetEmbeddings.from_huggingface(Recorder())
+    embeddings = FakeHuggingFaceEmbeddings()
+    embeddings.multi_process = True
+    with pytest.raises(TypeError):
+        TokenBudgetEmbeddings.from_huggingface(embeddings)
@@ -0,0 +1,81 @@
+import tracemalloc
+from langchain_core.documents import Document
+from projects.document_processing.deduplication import MinHashDeduplicator
+
+HEADER = "ООО «Ромашка». Руководство пользователя, версия 2.1. Все права защищены."
+
+
+def chunk(text: str, page: int) -> Document:
+    return Document(page_content=text, metadata={"source": "manual.pdf", "page": page})
+
+
+def unique_text(index: int) -> str:
+    return f"Раздел {index}: " + " ".join(
+        f"слово{index * 31 + word}" for word in range(40)
+    )
+
+
+def test_near_duplicates_are_recorded_on_a_copy():
+    section = unique_text(1)
+    documents = [
+        chunk(HEADER, 0),
+        chunk(section, 0),
+        chunk(HEADER.replace(" ", "\n  "), 1),
+        chunk(HEADER.upper(), 2),
+        chunk(HEADER, 3),
+        chunk(section.replace("слово40", "слово4O"), 3),
+    ]
+    kept = list(MinHashDeduplicator().filter(documents))
+
+    assert [document.page_content for document in kept] == [HEADER, section]
+    assert [d["page"] for d in kept[0].metadata["duplicates"]] == [1, 2, 3]
+    assert kept[0].metadata["duplicates"][-1]["similarity"] == 1.0
+    (near,) = kept[1].metadata["duplicates"]
+    assert near["page"] == 3 and 0.9 <= near["similarity"] < 1.0
+    # The documents passed in are left as they were.
+    assert documents[0].metadata == {"source": "manual.pdf", "page": 0}
+    assert kept[0].metadata is not documents[0].metadata
+
+
+def test_duplicates_list_is_replaced_not_appended_to():
+    kept, seen = [], []
+
+    def documents():
+        yield chunk(HEADER, 0)
+        yield chunk(HEADER, 1)
+        # The list a reader on the event loop could be holding by now.
+        seen.append(kept[0].metadata["duplicates"])
+        yield chunk(HEADER, 2)
+
+    for document in MinHashDeduplicator().filter(documents()):
+        kept.append(document)
+    assert [d["page"] for d in seen[0]] == [1]
+    assert [d["page"] for d in kept[0].metadata["duplicates"]] == [1, 2]
+
+
+def test_only_the_last_max_kept_chunks_are_remembered():
+    documents = [chunk(HEADER, 0)]
+    documents += [chunk(unique_text(index), index) for index in range(1, 4)]
+    documents += [chunk(HEADER, 4), chunk(unique_text(3), 5)]
+    kept = list(MinHashDeduplicator(max_kept=2).filter(documents))
+    # The header fell out of the window, the last section had not.
+    assert [document.metadata["page"] for document in kept] == [0, 1, 2, 3, 4]
+    assert [d["page"] for d in kept[3].metadata["duplicates"]] == [5]
+
+
+def test_memory_stays_flat_over_a_long_stream():
+    def stream(count: int):
+        for index in range(count):
+            yield chunk(unique_text(index), index)
+
+    def peak(count: int) -> int:
+        deduplicator = MinHashDeduplicator(max_kept=200)
+        tracemalloc.start()
+        try:
+            for _ in deduplicator.filter(stream(count)):
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    assert peak(2000) < 1.5 * peak(400)
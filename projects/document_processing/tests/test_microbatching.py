@@ -0,0 +1,104 @@
+import asyncio
+import time
+from langchain_core.embeddings import Embeddings
+from projects.document_processing.microbatching import MicroBatchingEmbeddings
+
+PASS_TIME = 0.02  # seconds per forward pass, whatever the batch size
+
+
+class SlowEmbeddings(Embeddings):
+    """Fake model: every pass costs the same, so batching is what scales."""
+
+    def __init__(self):
+        self.batches: list[list[str]] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.batches.append(texts)
+        time.sleep(PASS_TIME)
+        return [[float(len(text)), float(text.count("a"))] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+async def query_latencies(service: MicroBatchingEmbeddings, sessions: int):
+    async def query(text: str) -> tuple[float, str, list[float]]:
+        start = time.perf_counter()
+        vector = await service.aembed_query(text)
+        return time.perf_counter() - start, text, vector
+
+    return await asyncio.gather(
+        *(query("a" * index + "b" * (sessions - index)) for index in range(sessions))
+    )
+
+
+def test_concurrent_queries_share_passes():
+    async def main():
+        model = SlowEmbeddings()
+        service = MicroBatchingEmbeddings(
+            model, embed_queries=model.embed_documents, max_wait=0.01
+        )
+        try:
+            single = max(latency for latency, *_ in await query_latencies(service, 1))
+            results = await query_latencies(service, 32)
+        finally:
+            await service.aclose()
+        return model, service, single, results
+
+    model, service, single, results = asyncio.run(main())
+
+    # Each caller gets the vector of its own text.
+    for _, text, vector in results:
+        assert vector == [float(len(text)), float(text.count("a"))]
+    # 32 sessions take a few passes, not 32, and wait about as long as one.
+    assert service.stats["query_requests"] == 33
+    assert service.stats["query_batches"] <= 4
+    assert len(model.batches) == service.stats["query_batches"]
+    assert max(latency for latency, *_ in results) < 4 * single + PASS_TIME
+
+
+def test_queries_and_documents_are_batched_separately():
+    async def main():
+        model = SlowEmbeddings()
+        service = MicroBatchingEmbeddings(
+            model, embed_queries=lambda texts: [[0.0, 0.0]] * len(texts)
+        )
+        try:
+            return await asyncio.gather(
+                service.aembed_query("query"),
+                service.aembed_documents(["one", "two"]),
+                service.aembed_documents(["three"]),
+            )
+        finally:
+            await service.aclose()
+
+    query, documents, more = asyncio.run(main())
+    assert query == [0.0, 0.0]
+    assert documents == [[3.0, 0.0], [3.0, 0.0]]
+    assert more == [[5.0, 0.0]]
+
+
+def test_failed_pass_reaches_every_caller():
+    class FailsOnce(SlowEmbeddings):
+        def embed_documents(self, texts: list[str]) -> list[list[float]]:
+            if not self.batches:
+                self.batches.append(texts)
+                raise RuntimeError("out of memory")
+            return super().embed_documents(texts)
+
+    async def main():
+        model = FailsOnce()
+        service = MicroBatchingEmbeddings(model, embed_queries=model.embed_documents)
+        try:
+            results = await asyncio.gather(
+                *(service.aembed_query(str(index)) for index in range(3)),
+                return_exceptions=True,
+            )
+            # The collector survives the failure.
+            return results, await service.aembed_query("again")
+        finally:
+            await service.aclose()
+
+    results, again = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert again == [5.0, 2.0]
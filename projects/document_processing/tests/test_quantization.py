@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from projects.document_processing.quantization import QuantizedVectorStore
+from projects.document_processing.scoring import normalize
+
+TEXTS = [f"text {index}" for index in range(300)]
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """Documents are the indexes of rows of ``vectors``, as text."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.vectors[[int(text) for text in texts]].tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.vectors[int(text)].tolist()
+
+
+def clustered_vectors(size: int, dimensions: int, rng: np.random.Generator):
+    # Like sentence embeddings: around topics, sharing a common direction.
+    common = rng.normal(size=dimensions) * 3
+    centers = rng.normal(size=(size // 100 + 1, dimensions)) + common
+    vectors = centers[rng.integers(len(centers), size=size)]
+    vectors += rng.normal(size=(size, dimensions)) * 1.5
+    return normalize(vectors.astype(np.float32))
+
+
+@pytest.fixture
+def embeddings():
+    return DeterministicFakeEmbedding(size=64)
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_dump_and_load(tmp_path, embeddings, mode):
+    store = QuantizedVectorStore(embeddings, str(tmp_path), mode)
+    store.add_texts(TEXTS, [{"index": index} for index in range(len(TEXTS))])
+    store.dump()
+    expected = store.similarity_search_with_score("text 7", 4)
+
+    loaded = QuantizedVectorStore.load(str(tmp_path), embeddings)
+    assert len(loaded) == len(TEXTS)
+    assert loaded.similarity_search_with_score("text 7", 4) == expected
+    loaded.add_texts(["added"])
+    document, score = loaded.similarity_search_with_score("added", 1)[0]
+    assert document.page_content == "added" and score == pytest.approx(1.0)
+
+
+def test_load_drops_vectors_added_after_dump(tmp_path, embeddings):
+    store = QuantizedVectorStore(embeddings, str(tmp_path))
+    store.add_texts(TEXTS)
+    store.dump()
+    store.add_texts(["not dumped"])
+
+    loaded = QuantizedVectorStore.load(str(tmp_path), embeddings)
+    loaded.add_texts(["x"])
+    document, score = loaded.similarity_search_with_score("x", 1)[0]
+    assert document.page_content == "x" and score == pytest.approx(1.0)
+
+
+def test_new_store_in_used_directory_starts_empty(tmp_path, embeddings):
+    store = QuantizedVectorStore(embeddings, str(tmp_path))
+    store.add_texts(TEXTS)
+    store.dump()
+
+    fresh = QuantizedVectorStore(embeddings, str(tmp_path))
+    assert len(fresh) == 0
+    fresh.add_texts(["x", "y"])
+    document, score = fresh.similarity_search_with_score("x", 1)[0]
+    assert document.page_content == "x" and score == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("mode, minimum", [("int8", 0.95), ("binary", 0.8)])
+def test_recall(tmp_path, mode, minimum):
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(5000, 256, rng)
+    queries = normalize(vectors[:50] + rng.normal(size=(50, 256)) * 0.03)
+    store = QuantizedVectorStore(PrecomputedEmbeddings(vectors), str(tmp_path), mode)
+    for start in range(0, len(vectors), 1000):
+        store.add_documents(
+            [Document(page_content=str(index)) for index in range(start, start + 1000)]
+        )
+    assert store.recall(queries, 4) >= minimum
@@ -1,14 +1,13 @@
+# Run from the project root, so that projects.* imports resolve:
+#   python -m projects.embeddings.myCode
+# Embeddings are cached in embeddings.sqlite in the current directory (set
+# EMBEDDING_CACHE_PATH to use another file), a second run doesn't run the
+# model again.
 import time
-import numpy as np
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
-
-
-def similarity_score(vector1: np.array, vector2: np.array) -> float:
-    return np.sum(vector1 * vector2) / (
-        np.linalg.norm(vector1) * np.linalg.norm(vector2)
-    )
-
+from projects.document_processing.embedding_cache import CachedEmbeddings
+from projects.document_processing.scoring import SimilarityIndex
 
 relevant_doc = Document(
     page_content="Большая языковая модель это языковая модель, состоящая из нейронной сети со множеством параметров (обычно миллиарды весовых коэффициентов и более), обученной на большом количестве неразмеченного текста с использованием обучения без учителя."
@@ -19,8 +18,10 @@ irrelevant_doc = Document(
 
 
 # Using free local embeddings - no API key required!
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+embeddings = CachedEmbeddings(
+    HuggingFaceEmbeddings(
+        model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    )
 )
 
 
@@ -31,11 +32,8 @@ document_vectors = embeddings.embed_documents(
     [relevant_doc.page_content, irrelevant_doc.page_content]
 )
 
-print(
-    "Relevant document score:",
-    similarity_score(np.array(query_vector), np.array(document_vectors[0])),
-)
-print(
-    "Irrelevant document score:",
-    similarity_score(np.array(query_vector), np.array(document_vectors[1])),
-)
+# Cosine similarities of the query with both documents, in one product.
+scores = SimilarityIndex(document_vectors).scores(query_vector)[0]
+print("Relevant document score:", scores[0])
+print("Irrelevant document score:", scores[1])
+print("Embedding cache:", dict(embeddings.stats))
@@ -1,13 +1,12 @@
-import numpy as np
+# Run from the project root, so that projects.* imports resolve:
+#   python -m projects.multilingual_e5.myCode
+# Embeddings are cached in embeddings.sqlite in the current directory (set
+# EMBEDDING_CACHE_PATH to use another file), a second run doesn't run the
+# model again.
 from langchain_huggingface.embeddings import HuggingFaceEmbeddings
 from langchain_core.documents import Document
-
-
-def similarity_score(vector1: np.array, vector2: np.array) -> float:
-    return np.sum(vector1 * vector2) / (
-        np.linalg.norm(vector1) * np.linalg.norm(vector2)
-    )
-
+from projects.document_processing.embedding_cache import CachedEmbeddings
+from projects.document_processing.scoring import SimilarityIndex
 
 relevant_doc = Document(
     page_content="passage: Большая языковая модель это языковая модель, состоящая из нейронной сети со множеством параметров (обычно миллиарды весовых коэффициентов и более), обученной на большом количестве неразмеченного текста с использованием обучения без учителя."
@@ -17,9 +16,11 @@ irrelevant_doc = Document(
 )
 
 
-embeddings = HuggingFaceEmbeddings(
-    model_name="intfloat/multilingual-e5-base"
-)  # or intfloat/multilingual-e5-large-instruct
+embeddings = CachedEmbeddings(
+    HuggingFaceEmbeddings(
+        model_name="intfloat/multilingual-e5-base"
+    )  # or intfloat/multilingual-e5-large-instruct
+)
 
 document_vectors = embeddings.embed_documents(
     [relevant_doc.page_content, irrelevant_doc.page_content]
@@ -27,11 +28,8 @@ document_vectors = embeddings.embed_documents(
 
 query_vector = embeddings.embed_query("query: Что такое большая языковая модель?")
 
-print(
-    "Relevant document score:",
-    similarity_score(np.array(query_vector), np.array(document_vectors[0])),
-)
-print(
-    "Irrelevant document score:",
-    similarity_score(np.array(query_vector), np.array(document_vectors[1])),
-)
+# Cosine similarities of the query with both documents, in one product.
+scores = SimilarityIndex(document_vectors).scores(query_vector)[0]
+print("Relevant document score:", scores[0])
+print("Irrelevant document score:", scores[1])
+print("Embedding cache:", dict(embeddings.stats))
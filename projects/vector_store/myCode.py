@@ -1,8 +1,13 @@
+# Run from the project root, so that projects.* imports resolve:
+#   python -m projects.vector_store.myCode
+# Embeddings are cached in embeddings.sqlite in the current directory (set
+# EMBEDDING_CACHE_PATH to use another file), a second run doesn't run the
+# model again.
 import time
 from langchain_core.vectorstores import InMemoryVectorStore
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
-
+from projects.document_processing.embedding_cache import CachedEmbeddings
 
 relevant_doc = Document(
     page_content="Большая языковая модель это языковая модель, состоящая из нейронной сети со множеством параметров (обычно миллиарды весовых коэффициентов и более), обученной на большом количестве неразмеченного текста с использованием обучения без учителя."
@@ -12,8 +17,10 @@ irrelevant_doc = Document(
 )
 
 # Using free local embeddings - no API key required!
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+embeddings = CachedEmbeddings(
+    HuggingFaceEmbeddings(
+        model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    )
 )
 
 vectorstore = InMemoryVectorStore.from_documents(
@@ -25,3 +32,4 @@ retriever = vectorstore.as_retriever(search_kwargs={"k": 1})
 time.sleep(2)
 result = retriever.invoke("Что такое большая языковая модель?")
 print(result)
+print("Embedding cache:", dict(embeddings.stats))